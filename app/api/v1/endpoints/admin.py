@@ -3,6 +3,9 @@ from firebase_admin import auth, firestore
 from typing import Dict, List, Any, Optional
 from app.deps.auth import verify_firebase_token
 from app.config import db
+from app.services.rag_service.rag import get_rag_service, reload_rag_service, get_reload_status
+from app.services.rag_service.similarity import get_embedding_batcher, get_embedding_cache
+from app.services.voice_service.tts import get_tts_service
 from app.api.v1.schemas.user import WorkoutPlan, DietPlan, DietPlanUpdate, FeedbackResponse, FeedbackStatus, UpdateStatusPayload, DashboardStats, FeedbackCountStats, RecentPlan, RecentFeedback, RecentUser, DailyGrowth, UserAdminView, UpdateAdminStatusPayload
 from datetime import datetime, timedelta
 
@@ -483,4 +486,86 @@ def delete_user(
         raise HTTPException(status_code=404, detail="User not found in Firebase Authentication.")
     except Exception as e:
         print(f"Error deleting user {user_id}: {e}")
-        raise HTTPException(status_code=500, detail="Failed to delete user.")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Failed to delete user.")
+
+@router.get("/rag/answer-cache")
+def get_rag_answer_cache_stats(
+    user=Depends(verify_admin_token)
+):
+    """
+    Admin route to view semantic answer cache metrics (size, hit ratio, evictions).
+    """
+    return get_rag_service().answer_cache.stats()
+
+@router.delete("/rag/answer-cache")
+def flush_rag_answer_cache(
+    user=Depends(verify_admin_token)
+):
+    """
+    Admin route to flush the semantic answer cache, e.g. after editing the knowledge base.
+    """
+    removed = get_rag_service().answer_cache.clear()
+    return {"message": f"Answer cache flushed ({removed} entries removed)."}
+
+@router.post("/rag/reload")
+def reload_rag_corpus(
+    shard: Optional[str] = Query(None, description="Reload only this shard; all shards if omitted"),
+    user=Depends(verify_admin_token)
+):
+    """
+    Admin route to reload the knowledge base from disk without a restart.
+    The new index is built in the background and swapped in when ready; poll GET /rag/reload for progress.
+    """
+    if not reload_rag_service(shard):
+        raise HTTPException(status_code=409, detail="A RAG reload is already in progress.")
+    return {"message": "RAG reload started.", "status": get_reload_status()}
+
+@router.get("/rag/shards")
+def get_rag_shards(
+    user=Depends(verify_admin_token)
+):
+    """
+    Admin route to list the knowledge-base shards with their weights, sizes and corpus versions.
+    """
+    return [shard.info() for shard in get_rag_service().retriever.shards()]
+
+@router.get("/rag/reload")
+def get_rag_reload_status(
+    user=Depends(verify_admin_token)
+):
+    """
+    Admin route to view the state of the last RAG reload (building, idle or failed) and the live generation.
+    """
+    return get_reload_status()
+
+@router.get("/voice/tts-cache")
+def get_tts_cache_stats(
+    user=Depends(verify_admin_token)
+):
+    """
+    Admin route to view TTS audio cache metrics (memory/disk hits, misses, size).
+    """
+    return get_tts_service().cache.stats()
+
+@router.delete("/voice/tts-cache")
+def flush_tts_cache(
+    user=Depends(verify_admin_token)
+):
+    """
+    Admin route to flush the TTS audio cache, e.g. after changing the TTS voice prompt.
+    """
+    removed = get_tts_service().cache.clear()
+    return {"message": f"TTS cache flushed ({removed} in-memory entries removed)."}
+
+@router.get("/rag/embedding-stats")
+def get_rag_embedding_stats(
+    user=Depends(verify_admin_token)
+):
+    """
+    Admin route to view query embedding metrics (cache hit ratio, micro-batch sizes, queue wait).
+    """
+    batcher = get_embedding_batcher()
+    return {
+        "cache": get_embedding_cache().stats(),
+        "batcher": batcher.stats() if batcher is not None else None
+    }
@@ -1,32 +1,42 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Body, Form
-import tempfile
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Body, Form, Request, Header, Response
+from fastapi.responses import StreamingResponse
+from typing import Optional
 import os
+import json
+import secrets
 from app.services.voice_service.stt import get_speech_service
 from app.services.voice_service.llm import get_language_model_service as get_voice_llm_service
 from app.services.voice_service.tts import get_tts_service
-from app.utils.audio import audio_to_base64
-from app.config import ALLOWED_AUDIO_EXTENSIONS, db
+from app.services.voice_service.executors import run_stt, run_io
+from app.services.voice_service.audio_decoder import decode_audio, SAMPLE_RATE
+from app.services.voice_service.audio_store import get_audio_store
+from app.utils.audio import audio_to_base64, AUDIO_CONTENT_TYPES
+from app.config import ALLOWED_AUDIO_EXTENSIONS, RAG_BATCH_MAX_QUERIES, VOICE_AUDIO_STORE_TTL, db
 from app.services.rag_service.rag import get_rag_service
-from app.api.v1.schemas.query import QueryRequest, PlanRequest
+from app.api.v1.schemas.query import QueryRequest, BatchQueryRequest, PlanRequest
 from app.services.voice_service.plan_generator import generate_diet_plan, generate_fitness_plan
-from app.services.voice_service.conversation import reset_conversation, get_user_answers
+from app.services.voice_service.conversation import reset_conversation, get_user_answers, conversation_lock
 from app.utils.plan_utils import store_user_diet_plan, store_user_fitness_plan
 
 router = APIRouter()
 
+# How /assistant returns the reply audio: base64 inside JSON (default), a multipart body with the
+# JSON metadata and raw audio parts, or JSON with a short-lived URL to fetch the audio from
+RESPONSE_MODES = ["base64", "multipart", "url"]
+
 @router.post("/assistant")
 async def assistant(
+    request: Request,
     file: UploadFile = File(...),
     planType: str = Form("diet"),
-    user_id: str = Form("default")
+    user_id: str = Form("default"),
+    responseMode: Optional[str] = Form(None)
 ):
-    # Get service instances (already initialized)
-    stt_service = get_speech_service()
+    # Get service instances (the first call loads Whisper, so do it off the event loop)
+    stt_service = await run_stt(get_speech_service)
     llm_service = get_voice_llm_service()
     tts_service = get_tts_service()
     
-    tmp_audio_path = None
-    
     try:
         # Convert planType to plan_type for internal use
         plan_type = planType.lower()
@@ -35,6 +45,13 @@ async def assistant(
         # Validate plan_type
         if plan_type not in ["diet", "fitness"]:
             raise HTTPException(status_code=400, detail="planType must be 'diet' or 'fitness'")
+
+        # Response mode: explicit form field, else an Accept header asking for multipart
+        response_mode = (responseMode or "").lower()
+        if not response_mode:
+            response_mode = "multipart" if "multipart/" in request.headers.get("accept", "") else "base64"
+        if response_mode not in RESPONSE_MODES:
+            raise HTTPException(status_code=400, detail=f"responseMode must be one of {RESPONSE_MODES}")
             
         # Validate audio
         ext = os.path.splitext(file.filename)[1].lower() or ".webm"
@@ -47,51 +64,76 @@ async def assistant(
         if not llm_service.is_available():
             raise HTTPException(status_code=500, detail="Language model service not available")
 
-        # Save uploaded audio
-        with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
-            content = await file.read()
-            if not content:
-                raise HTTPException(status_code=400, detail="Empty audio file")
-            tmp.write(content)
-            tmp_audio_path = tmp.name
-            
-        print(f"Processing audio file: {tmp_audio_path}")
+        # Read the upload into memory
+        content = await file.read()
+        if not content:
+            raise HTTPException(status_code=400, detail="Empty audio file")
+
+        # Every stage blocks for hundreds of milliseconds or more, so each runs on its own pool
+        # and the event loop stays free for other requests
+
+        # Step 1: Decode to 16 kHz float32 in memory (no temp file, no per-request ffmpeg spawn)
+        audio = await run_io(decode_audio, content, ext)
+        print(f"Processing audio: {len(content)} bytes {ext}, {len(audio) / SAMPLE_RATE:.1f}s")
 
-        # Step 1: Speech-to-Text
-        user_text = stt_service.transcribe(tmp_audio_path)
+        # Step 2: Speech-to-Text (CPU pool)
+        user_text = await run_stt(stt_service.transcribe, audio)
         print(f"Transcribed text: {user_text}")
 
-        # Step 2: Language Model (pass plan_type and user_id)
-        reply_text = llm_service.generate_response(user_text, user_id=user_id, plan_type=plan_type)
+        # Step 3: Language Model (pass plan_type and user_id; I/O pool)
+        # The turn mutates this user's conversation state, so turns for one user run one at a time;
+        # waiting happens on the event loop, not on an I/O pool thread
+        async with conversation_lock(user_id):
+            reply_text = await run_io(llm_service.generate_response, user_text, user_id=user_id, plan_type=plan_type)
         print(f"Assistant reply: {reply_text}")
 
-        # Step 3: Text-to-Speech
-        audio_content, suffix = tts_service.generate_speech(reply_text)
-        audio_base64 = audio_to_base64(audio_content, suffix)
+        # Step 4: Text-to-Speech (I/O pool)
+        audio_content, suffix = await run_io(tts_service.generate_speech, reply_text)
 
-        return {
+        result = {
             "user_text": user_text,
             "reply": reply_text,
-            "audio_base64": audio_base64,
             "plan_type": plan_type,
             "planType": planType,
             "user_id": user_id,
             "status": "success",
         }
+        content_type = AUDIO_CONTENT_TYPES.get(suffix, "application/octet-stream")
+
+        # Binary modes send the audio as raw bytes: no base64 encode here, no decode on the client
+        if response_mode == "multipart":
+            return multipart_response(result, audio_content, content_type, f"reply{suffix}")
+        if response_mode == "url":
+            audio_id = get_audio_store().put(audio_content, content_type)
+            result["audio_url"] = str(request.url_for("get_assistant_audio", audio_id=audio_id))
+            result["audio_content_type"] = content_type
+            return result
+
+        result["audio_base64"] = await run_io(audio_to_base64, audio_content, suffix)
+        return result
 
     except HTTPException:
         raise
     except Exception as e:
         print(f"Unexpected error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
-        
-    finally:
-        # Cleanup temp files
-        if tmp_audio_path and os.path.exists(tmp_audio_path):
-            try:
-                os.unlink(tmp_audio_path)
-            except Exception as e:
-                print(f"Cleanup warning: {e}")
+
+@router.get("/assistant/audio/{audio_id}", name="get_assistant_audio")
+def get_assistant_audio(audio_id: str, range_header: Optional[str] = Header(None, alias="Range")):
+    """Reply audio from /assistant in url mode; supports single byte-range requests for seeking"""
+    item = get_audio_store().get(audio_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Audio not found or expired")
+    audio, content_type = item
+
+    headers = {"Accept-Ranges": "bytes", "Cache-Control": f"private, max-age={VOICE_AUDIO_STORE_TTL}"}
+    byte_range = parse_byte_range(range_header, len(audio))
+    if byte_range is None:
+        return Response(content=audio, media_type=content_type, headers=headers)
+
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{len(audio)}"
+    return Response(content=audio[start:end + 1], status_code=206, media_type=content_type, headers=headers)
 
 @router.post("/generate-plan")
 async def generate_plan(request: PlanRequest):
@@ -163,7 +205,8 @@ async def reset_user_conversation(
         if plan_type not in ["diet", "fitness"]:
             raise HTTPException(status_code=400, detail="plan_type must be 'diet' or 'fitness'")
         
-        reset_conversation(user_id, plan_type)
+        async with conversation_lock(user_id):
+            reset_conversation(user_id, plan_type)
         return {
             "message": f"Conversation reset for user {user_id} and plan type {plan_type}",
             "status": "success"
@@ -173,27 +216,160 @@ async def reset_user_conversation(
         raise HTTPException(status_code=500, detail=f"Reset conversation error: {str(e)}")
 
 @router.post("/rag/query")
-async def rag_query(request: QueryRequest):
+def rag_query(request: QueryRequest):
     try:
+        # Plain def: FastAPI runs it in the threadpool, so embedding, retrieval, web search and Gemini
+        # never block the event loop, and concurrent duplicates can actually overlap and coalesce
         # Get RAG service using the singleton pattern
         rag = get_rag_service()
-        result = rag.hybrid_rag_answer(query=request.query, top_k=request.top_k)
-        
-        # Determine if we got a real answer
-        if result["source"] == "none":
-            return {
-                "answer": result["answer"],
-                "source": "none",
-                "results_count": 0,
-                "status": "out_of_domain"
-            }
+        result = rag.hybrid_rag_answer(
+            query=request.query,
+            top_k=request.top_k,
+            max_words=request.max_words,
+            direct_answer=request.direct_answer,
+            shards=request.shards
+        )
         
+        return format_rag_result(result)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"RAG service error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"RAG service error: {str(e)}")
+
+@router.post("/rag/query/stream")
+def rag_query_stream(request: QueryRequest):
+    """Server-sent events: a meta event once retrieval is done, token events as Gemini streams, then done"""
+    rag = get_rag_service()
+    # The generator only starts once the 200 is sent, so reject unknown shards up front
+    rag.retriever.select(request.shards)
+    events = rag.stream_rag_answer(
+        query=request.query,
+        top_k=request.top_k,
+        max_words=request.max_words,
+        direct_answer=request.direct_answer,
+        shards=request.shards
+    )
+    # Sync generator: Starlette iterates it in the threadpool, so embedding and Gemini never block the loop
+    return StreamingResponse(
+        sse_stream(events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/rag/query/batch")
+def rag_query_batch(request: BatchQueryRequest):
+    """Answer many questions in one request (FAQ pre-generation, evaluation runs); results keep input order"""
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="queries cannot be empty")
+    if len(request.queries) > RAG_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {RAG_BATCH_MAX_QUERIES} queries per batch")
+
+    try:
+        # Plain def: FastAPI runs it in the threadpool, so a long batch doesn't block the event loop
+        rag = get_rag_service()
+        results = rag.batch_rag_answer(
+            request.queries,
+            top_k=request.top_k,
+            max_words=request.max_words,
+            direct_answer=request.direct_answer,
+            shards=request.shards
+        )
         return {
-            "answer": result["answer"],
-            "source": result["source"],
-            "results_count": len(result["results"]),
+            "results": [
+                dict(format_rag_result(result), query=query)
+                for query, result in zip(request.queries, results)
+            ],
+            "count": len(results),
             "status": "success"
         }
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"RAG service error: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"RAG service error: {str(e)}")
\ No newline at end of file
+        print(f"RAG batch error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"RAG service error: {str(e)}")
+
+def format_rag_result(result: dict) -> dict:
+    # Determine if we got a real answer
+    if result["source"] == "none":
+        return {
+            "answer": result["answer"],
+            "source": "none",
+            "results_count": 0,
+            "status": "out_of_domain"
+        }
+    if result["source"] == "error":
+        return {
+            "answer": result["answer"],
+            "source": "none",
+            "results_count": 0,
+            "status": "error"
+        }
+
+    response = {
+        "answer": result["answer"],
+        "source": result["source"],
+        "mode": result.get("mode", "generated"),
+        "results_count": len(result["results"]),
+        "status": "success"
+    }
+    if "context_tokens" in result:
+        response["context_tokens"] = result["context_tokens"]
+    return response
+
+def multipart_response(metadata: dict, audio: bytes, content_type: str, filename: str) -> Response:
+    """multipart/form-data body: a JSON "metadata" part and the raw "audio" part (browsers parse it with response.formData())"""
+    boundary = secrets.token_hex(16)
+    head = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="metadata"\r\n'
+        f"Content-Type: application/json\r\n\r\n"
+        f"{json.dumps(metadata)}\r\n"
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="audio"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(audio)}\r\n\r\n"
+    ).encode("utf-8")
+    body = b"".join((head, audio, f"\r\n--{boundary}--\r\n".encode("ascii")))
+    return Response(content=body, media_type=f"multipart/form-data; boundary={boundary}")
+
+def parse_byte_range(header: Optional[str], size: int):
+    """(start, end) inclusive for a single "bytes=" range; None to send the whole body"""
+    if not header or not header.startswith("bytes=") or "," in header:
+        # Absent, other units or multiple ranges: a full 200 response is always allowed
+        return None
+    first, _, last = header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start, end = max(0, size - int(last)), size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416, detail="Requested range not satisfiable", headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+def format_sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_stream(events):
+    try:
+        for event, data in events:
+            if event == "meta":
+                meta = format_rag_result(dict(data, answer=""))
+                meta.pop("answer")
+                yield format_sse("meta", meta)
+            elif event == "token":
+                yield format_sse("token", {"text": data})
+            else:
+                yield format_sse("done", format_rag_result(data))
+    except Exception as e:
+        # Headers are already sent, so errors are reported in-band
+        print(f"RAG stream error: {str(e)}")
+        detail = e.detail if isinstance(e, HTTPException) else str(e)
+        yield format_sse("error", {"detail": f"RAG service error: {detail}"})
@@ -1,9 +1,19 @@
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 class QueryRequest(BaseModel):
     query: str
     top_k: int = 5
+    direct_answer: Optional[bool] = None  # None = server default (RAG_DIRECT_ANSWER)
+    max_words: Optional[int] = None  # trim direct knowledge-base answers
+    shards: Optional[List[str]] = None  # None = search every shard
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    top_k: int = 5
+    direct_answer: Optional[bool] = None
+    max_words: Optional[int] = None
+    shards: Optional[List[str]] = None
 
 class PlanRequest(BaseModel):
     plan_type: str  # "diet" or "fitness"
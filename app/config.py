@@ -17,6 +17,63 @@ GEMINI_TTS_VOICE = "Sulafat"
 
 # App Settings
 ALLOWED_AUDIO_EXTENSIONS = [".wav", ".mp3", ".m4a", ".ogg", ".webm"]
+VOICE_STT_WORKERS = int(os.getenv("VOICE_STT_WORKERS", "1"))  # concurrent Whisper decodes (CPU-bound)
+VOICE_IO_WORKERS = int(os.getenv("VOICE_IO_WORKERS", "16"))  # concurrent Gemini text/TTS calls (network-bound)
+VOICE_DECODER_POOL_SIZE = int(os.getenv("VOICE_DECODER_POOL_SIZE", "2"))  # pre-spawned ffmpeg processes for webm/m4a
+VOICE_DECODE_TIMEOUT = float(os.getenv("VOICE_DECODE_TIMEOUT", "30"))  # seconds per upload
+VOICE_TTS_CACHE_MAX_BYTES = int(os.getenv("VOICE_TTS_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # in-memory audio tier
+VOICE_TTS_CACHE_DIR = os.getenv(
+    "VOICE_TTS_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "utils", "tts_cache")
+)  # set to "" to keep rendered speech in memory only
+VOICE_TTS_PRERENDER = os.getenv("VOICE_TTS_PRERENDER", "true").lower() == "true"  # render scripted prompts at startup
+VOICE_AUDIO_STORE_TTL = int(os.getenv("VOICE_AUDIO_STORE_TTL", "300"))  # seconds an /assistant audio URL stays valid
+VOICE_AUDIO_STORE_MAX_BYTES = int(os.getenv("VOICE_AUDIO_STORE_MAX_BYTES", str(64 * 1024 * 1024)))  # oldest evicted first
+
+# RAG Settings
+RAG_SHARDS = os.getenv("RAG_SHARDS", "")  # e.g. "nutrition,workouts,medical-safety:1.5" (name[:weight]); empty = single corpus
+RAG_SHARDS_DIR = os.getenv(
+    "RAG_SHARDS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "utils", "corpus", "shards")
+)  # one corpus store per shard name
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")  # torch, torch-int8 or onnx (query embedder only)
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE")  # optional prebuilt graph, e.g. onnx/model_qint8_avx512_vnni.onnx
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))  # in-memory LRU entries
+EMBEDDING_CACHE_DB = os.getenv("EMBEDDING_CACHE_DB")  # optional sqlite file for the on-disk tier
+EMBEDDING_CACHE_DISK_SIZE = int(os.getenv("EMBEDDING_CACHE_DISK_SIZE", "100000"))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))  # 1 disables the micro-batcher
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))  # collection window per batch
+RAG_INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "flat")  # flat, ivf, hnsw or ivfpq (built by corpus_builder)
+RAG_INDEX_NPROBE = int(os.getenv("RAG_INDEX_NPROBE", "16"))  # IVF lists scanned per query
+RAG_INDEX_EF_SEARCH = int(os.getenv("RAG_INDEX_EF_SEARCH", "64"))  # HNSW candidate list size
+RAG_EMBEDDING_DTYPE = os.getenv("RAG_EMBEDDING_DTYPE", "float32")  # float32, float16 or int8 index vectors
+RAG_RERANK_FACTOR = int(os.getenv("RAG_RERANK_FACTOR", "4"))  # candidates per hit re-scored in float32
+RAG_HYBRID = os.getenv("RAG_HYBRID", "true").lower() == "true"  # BM25 + dense with reciprocal rank fusion
+RAG_FUSION_K = int(os.getenv("RAG_FUSION_K", "60"))  # RRF constant
+RAG_FUSION_CANDIDATES = int(os.getenv("RAG_FUSION_CANDIDATES", "20"))  # per-retriever depth before fusion
+RAG_LEXICAL_MIN_SCORE = float(os.getenv("RAG_LEXICAL_MIN_SCORE", "0"))  # BM25 score that lowers a hit's cosine bar to the domain threshold; 0 = off
+RAG_CONTEXT_MAX_TOKENS = int(os.getenv("RAG_CONTEXT_MAX_TOKENS", "600"))  # prompt context budget (~4 chars/token)
+RAG_CONTEXT_PASSAGE_MAX_TOKENS = int(os.getenv("RAG_CONTEXT_PASSAGE_MAX_TOKENS", "250"))  # longer passages are cut to key sentences
+RAG_CONTEXT_DEDUP_SIMILARITY = float(os.getenv("RAG_CONTEXT_DEDUP_SIMILARITY", "0.8"))  # term Jaccard for near-duplicates
+RAG_DOMAIN_GATE = os.getenv("RAG_DOMAIN_GATE", "true").lower() == "true"  # centroid pre-check before retrieval
+RAG_DOMAIN_GATE_MARGIN = float(os.getenv("RAG_DOMAIN_GATE_MARGIN", "0.1"))  # estimates within this of the threshold still get a full search
+RAG_ANSWER_CACHE_SIZE = int(os.getenv("RAG_ANSWER_CACHE_SIZE", "1024"))  # 0 disables the semantic answer cache
+RAG_ANSWER_CACHE_MAX_DISTANCE = float(os.getenv("RAG_ANSWER_CACHE_MAX_DISTANCE", "0.05"))  # cosine distance
+RAG_ANSWER_CACHE_TTL = int(os.getenv("RAG_ANSWER_CACHE_TTL", "3600"))  # seconds
+RAG_DIRECT_ANSWER = os.getenv("RAG_DIRECT_ANSWER", "false").lower() == "true"  # default for API callers; voice side questions opt in
+RAG_DIRECT_ANSWER_THRESHOLD = float(os.getenv("RAG_DIRECT_ANSWER_THRESHOLD", "0.9"))
+RAG_WEB_SEARCH_PROVIDER = os.getenv("RAG_WEB_SEARCH_PROVIDER", "ddgs")  # ddgs, stub (offline) or none
+RAG_WEB_SEARCH_TIMEOUT = float(os.getenv("RAG_WEB_SEARCH_TIMEOUT", "3.0"))  # hard deadline in seconds
+RAG_WEB_SEARCH_CACHE_TTL = int(os.getenv("RAG_WEB_SEARCH_CACHE_TTL", "1800"))  # seconds
+RAG_WEB_SEARCH_CACHE_SIZE = int(os.getenv("RAG_WEB_SEARCH_CACHE_SIZE", "512"))
+RAG_WEB_INDEX_DIR = os.getenv(
+    "RAG_WEB_INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "utils", "corpus", "web_index")
+)  # set to "" to keep learned web snippets in memory only
+RAG_WEB_INDEX_SIZE = int(os.getenv("RAG_WEB_INDEX_SIZE", "5000"))  # 0 disables the web snippet index
+RAG_WEB_INDEX_TTL = int(os.getenv("RAG_WEB_INDEX_TTL", str(7 * 24 * 3600)))  # seconds
+RAG_WEB_INDEX_MIN_SIMILARITY = float(os.getenv("RAG_WEB_INDEX_MIN_SIMILARITY", "0.4"))  # snippet-to-query vetting
+RAG_BATCH_MAX_QUERIES = int(os.getenv("RAG_BATCH_MAX_QUERIES", "256"))  # per /rag/query/batch request
+RAG_BATCH_CONCURRENCY = int(os.getenv("RAG_BATCH_CONCURRENCY", "4"))  # parallel LLM calls per batch
+RAG_SINGLE_FLIGHT_TIMEOUT = float(os.getenv("RAG_SINGLE_FLIGHT_TIMEOUT", "30"))  # max wait on a duplicate in-flight call
+RAG_RELOAD_WATCH_INTERVAL = float(os.getenv("RAG_RELOAD_WATCH_INTERVAL", "0"))  # seconds; 0 = admin-triggered only
 
 #Initialize firebase
 cred = credentials.Certificate(os.getenv("GOOGLE_APPLICATION_CREDENTIALS"))
@@ -1,8 +1,13 @@
+import threading
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.endpoints import users  
 from app.api.v1.endpoints import assistant
 from app.api.v1.endpoints import admin
+from app.services.voice_service.executors import shutdown_executors
+from app.services.voice_service.audio_decoder import close_audio_decoder
+from app.services.voice_service.tts import get_tts_service, prerender_scripted_prompts
+from app.config import VOICE_TTS_PRERENDER
 
 app = FastAPI(
     title="Wellness Assistant API",
@@ -29,6 +34,19 @@ app.include_router(users.router, prefix="/api/v1", tags=["users"])
 app.include_router(assistant.router, prefix="/api/v1", tags=["assistant"])
 app.include_router(admin.router, prefix="/api/v1/admin", tags=["admin"])
 
+@app.on_event("startup")
+def prerender_voice_prompts():
+    if VOICE_TTS_PRERENDER:
+        # Create the service here so the background thread and the first request share one cache
+        get_tts_service()
+        # Only prompts missing from the disk cache are rendered, so restarts are free
+        threading.Thread(target=prerender_scripted_prompts, name="tts-prerender", daemon=True).start()
+
+@app.on_event("shutdown")
+def shutdown_voice_executors():
+    shutdown_executors()
+    close_audio_decoder()
+
 @app.get("/")
 async def root():
     return {
@@ -0,0 +1,104 @@
+# rag_service/answer_cache.py
+import itertools
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+class SemanticAnswerCache:
+    """Caches RAG answers by query embedding; a hit needs a close query AND the same retrieved context"""
+    def __init__(self, max_items=1024, max_distance=0.05, ttl_seconds=3600):
+        self.max_items = max_items
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+
+        self._entries = OrderedDict()  # entry id -> entry, in LRU order
+        self._by_context = {}          # context key -> set of entry ids
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def is_enabled(self):
+        return self.max_items > 0
+
+    def _remove(self, entry_id):
+        # Caller holds the lock
+        entry = self._entries.pop(entry_id)
+        ids = self._by_context[entry["context_key"]]
+        ids.discard(entry_id)
+        if not ids:
+            del self._by_context[entry["context_key"]]
+
+    def get(self, query_embedding, context_key):
+        """Return the cached result for a query within max_distance (cosine) sharing context_key"""
+        if not self.is_enabled():
+            return None
+
+        with self._lock:
+            now = time.time()
+            candidates = []
+            for entry_id in list(self._by_context.get(context_key, ())):
+                if self._entries[entry_id]["expires_at"] <= now:
+                    self._remove(entry_id)
+                    self.expirations += 1
+                else:
+                    candidates.append(entry_id)
+
+            if candidates:
+                matrix = np.stack([self._entries[i]["embedding"] for i in candidates])
+                sims = matrix @ np.asarray(query_embedding, dtype="float32")
+                best = int(np.argmax(sims))
+                if 1.0 - float(sims[best]) <= self.max_distance:
+                    entry_id = candidates[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    print(f"Answer cache hit (similarity={sims[best]:.4f})")
+                    return self._entries[entry_id]["result"]
+
+            self.misses += 1
+            return None
+
+    def put(self, query_embedding, context_key, result):
+        if not self.is_enabled():
+            return
+
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = {
+                "embedding": np.array(query_embedding, dtype="float32").reshape(-1),
+                "context_key": context_key,
+                "result": result,
+                "expires_at": time.time() + self.ttl_seconds,
+            }
+            self._by_context.setdefault(context_key, set()).add(entry_id)
+
+            while len(self._entries) > self.max_items:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            self._by_context.clear()
+            return removed
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.is_enabled(),
+                "size": len(self._entries),
+                "max_items": self.max_items,
+                "max_distance": self.max_distance,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
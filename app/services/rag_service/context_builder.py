@@ -0,0 +1,85 @@
+# rag_service/context_builder.py
+import re
+from .lexical import tokenize
+from app.config import RAG_CONTEXT_MAX_TOKENS, RAG_CONTEXT_PASSAGE_MAX_TOKENS, RAG_CONTEXT_DEDUP_SIMILARITY
+
+# Gemini averages roughly 4 characters per token on English text
+CHARS_PER_TOKEN = 4
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def split_sentences(text: str) -> list:
+    return [s.strip() for s in _SENTENCE_RE.split(text) if s.strip()]
+
+def jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def select_sentences(query_terms: set, text: str, budget: int) -> str:
+    """Keep the sentences sharing the most terms with the query, in their original order, within budget"""
+    sentences = split_sentences(text)
+    overlap = [len(query_terms & set(tokenize(sentence))) for sentence in sentences]
+    # Highest overlap first; earlier sentences win ties (a Q: line or topic sentence leads)
+    ranked = sorted(range(len(sentences)), key=lambda i: (-overlap[i], i))
+    if ranked and overlap[ranked[0]] > 0:
+        # Off-topic sentences don't earn a place once something matches the query
+        ranked = [i for i in ranked if overlap[i] > 0]
+
+    chosen, used = [], 0
+    for i in ranked:
+        cost = estimate_tokens(sentences[i]) + 1
+        if used + cost <= budget:
+            chosen.append(i)
+            used += cost
+    if not chosen and sentences:
+        # Even the best sentence is over budget: cut it to fit
+        return sentences[ranked[0]][:budget * CHARS_PER_TOKEN].rstrip() + "..."
+    return " ".join(sentences[i] for i in sorted(chosen))
+
+def build_context(query: str, passages: list, max_tokens: int = RAG_CONTEXT_MAX_TOKENS,
+                  passage_max_tokens: int = RAG_CONTEXT_PASSAGE_MAX_TOKENS,
+                  dedup_similarity: float = RAG_CONTEXT_DEDUP_SIMILARITY) -> dict:
+    """Assemble prompt context from passages (best first) under a token budget"""
+    query_terms = set(tokenize(query))
+    kept, seen = [], []
+    used = duplicates = truncated = 0
+    source_tokens = sum(estimate_tokens(p) for p in passages)
+
+    for passage in passages:
+        remaining = max_tokens - used
+        if remaining <= 0:
+            break
+
+        # 1. Drop passages that mostly repeat one already kept (mirrored Q/A, syndicated web snippets)
+        terms = set(tokenize(passage))
+        if any(jaccard(terms, other) >= dedup_similarity for other in seen):
+            duplicates += 1
+            continue
+
+        # 2. Long passages are cut down to their most query-relevant sentences
+        budget = min(passage_max_tokens, remaining)
+        text = passage.strip()
+        if estimate_tokens(text) > budget:
+            text = select_sentences(query_terms, text, budget)
+            truncated += 1
+        if not text:
+            continue
+
+        kept.append(text)
+        seen.append(terms)
+        used += estimate_tokens(text) + 1
+
+    text = "\n".join(kept)
+    return {
+        "text": text,
+        "passages": len(kept),
+        "tokens": estimate_tokens(text),
+        "source_tokens": source_tokens,
+        "duplicates_dropped": duplicates,
+        "truncated": truncated,
+        "omitted": len(passages) - len(kept) - duplicates,
+    }
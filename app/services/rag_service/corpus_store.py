@@ -0,0 +1,168 @@
+# rag_service/corpus_store.py
+import json
+import mmap
+import os
+import shutil
+import faiss
+import numpy as np
+from .retrieval import normalize_embeddings
+from .lexical import BM25Index
+from .domain_gate import DomainGate
+
+CORPUS_FORMAT_VERSION = 1
+
+EMBEDDINGS_FILE = "embeddings.npy"
+TEXTS_FILE = "texts.bin"
+OFFSETS_FILE = "offsets.npy"
+INDEX_FILE = "index.faiss"
+META_FILE = "meta.json"
+
+_base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_CORPUS_DIR = os.path.join(_base_dir, "utils", "corpus", "fitness_corpus")
+LEGACY_CORPUS_FILE = os.path.join(_base_dir, "utils", "corpus", "fitness_corpus.pkl")
+# Named corpus shards (nutrition, workouts, ...) each live in their own store under this directory
+DEFAULT_SHARDS_DIR = os.path.join(_base_dir, "utils", "corpus", "shards")
+
+# Zero-copy mmap of flat index codes when the installed FAISS supports it
+_INDEX_MMAP_FLAG = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+def corpus_version(path=None):
+    """Modification time of a store's meta file; with no path, the default store or else the legacy pickle"""
+    candidates = [os.path.join(path, META_FILE)] if path else [os.path.join(DEFAULT_CORPUS_DIR, META_FILE), LEGACY_CORPUS_FILE]
+    for candidate in candidates:
+        if os.path.exists(candidate):
+            return os.path.getmtime(candidate)
+    return None
+
+class CorpusTexts:
+    """Read-only sequence of corpus strings backed by an mmapped UTF-8 blob"""
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if idx < 0:
+            idx += len(self)
+        if idx < 0 or idx >= len(self):
+            raise IndexError("corpus index out of range")
+        start, end = int(self._offsets[idx]), int(self._offsets[idx + 1])
+        return self._blob[start:end].decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+class CorpusStore:
+    """Pickle-free corpus opened with mmap so workers share the same physical pages"""
+    def __init__(self, path=DEFAULT_CORPUS_DIR):
+        meta_path = os.path.join(path, META_FILE)
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f"{path} is not a corpus store. Run generate_embeddings.py first.")
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != CORPUS_FORMAT_VERSION:
+            raise ValueError(f"Unsupported corpus format version: {self.meta.get('version')}")
+
+        self.path = path
+        self.embeddings = np.load(os.path.join(path, EMBEDDINGS_FILE), mmap_mode="r")
+        offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+
+        texts_path = os.path.join(path, TEXTS_FILE)
+        if os.path.getsize(texts_path) > 0:
+            with open(texts_path, "rb") as f:
+                blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            blob = b""
+        self.corpus = CorpusTexts(blob, offsets)
+
+    def __len__(self):
+        return len(self.corpus)
+
+    def load_index(self):
+        """Load the serialized FAISS index, mmapped where the index type allows it"""
+        index_path = os.path.join(self.path, INDEX_FILE)
+        if not os.path.exists(index_path):
+            return None
+        return faiss.read_index(index_path, _INDEX_MMAP_FLAG)
+
+    def load_lexical(self):
+        """BM25 index saved next to the vectors (postings mmapped), or None for older stores"""
+        return BM25Index.load(self.path)
+
+    def load_domain_gate(self):
+        """Centroid domain gate built with the store, or None for older stores"""
+        return DomainGate.load(self.path)
+
+    @staticmethod
+    def exists(path=DEFAULT_CORPUS_DIR):
+        return os.path.exists(os.path.join(path, META_FILE))
+
+    @staticmethod
+    def write(path, corpus, embeddings, index=None, lexical=None, domain_gate=None, **meta):
+        """Write corpus, normalized embeddings, index, BM25 postings and domain gate, then swap into place"""
+        embeddings = normalize_embeddings(embeddings)
+        if len(corpus) != embeddings.shape[0]:
+            raise ValueError("corpus and embeddings must have the same length")
+
+        tmp_path = path + ".tmp"
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path)
+        os.makedirs(tmp_path)
+
+        # 1. Contiguous embedding matrix
+        np.save(os.path.join(tmp_path, EMBEDDINGS_FILE), embeddings)
+
+        # 2. Text blob + offsets
+        offsets = np.zeros(len(corpus) + 1, dtype="int64")
+        with open(os.path.join(tmp_path, TEXTS_FILE), "wb") as f:
+            for i, text in enumerate(corpus):
+                data = text.encode("utf-8")
+                f.write(data)
+                offsets[i + 1] = offsets[i] + len(data)
+        np.save(os.path.join(tmp_path, OFFSETS_FILE), offsets)
+
+        # 3. FAISS index (flat inner product unless one is supplied)
+        if index is None:
+            index = faiss.IndexFlatIP(embeddings.shape[1])
+            index.add(embeddings)
+        faiss.write_index(index, os.path.join(tmp_path, INDEX_FILE))
+
+        # 4. BM25 inverted index for hybrid retrieval
+        if lexical is None:
+            lexical = BM25Index.build(corpus)
+        lexical.save(tmp_path)
+
+        # 5. Centroid domain gate (cheap out-of-domain rejection)
+        if domain_gate is None:
+            domain_gate = DomainGate.build(embeddings)
+        domain_gate.save(tmp_path)
+
+        meta = {
+            "version": CORPUS_FORMAT_VERSION,
+            "count": len(corpus),
+            "dim": int(embeddings.shape[1]),
+            "normalized": True,
+            "lexical_terms": len(lexical.terms),
+            "domain_centroids": len(domain_gate),
+            **meta,
+        }
+        with open(os.path.join(tmp_path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        # 6. Swap into place; readers holding the old mmaps keep working until they close
+        old_path = path + ".old"
+        if os.path.exists(path):
+            if os.path.exists(old_path):
+                shutil.rmtree(old_path)
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        if os.path.exists(old_path):
+            shutil.rmtree(old_path)
+
+        return meta
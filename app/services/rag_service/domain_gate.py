@@ -0,0 +1,69 @@
+# rag_service/domain_gate.py
+import os
+import faiss
+import numpy as np
+from .retrieval import normalize_embeddings
+
+DOMAIN_CENTROIDS_FILE = "domain_centroids.npy"
+DOMAIN_RADII_FILE = "domain_radii.npy"
+
+# Per-cluster radius: this percentile of the member angles, so a few stray documents don't widen the whole cluster
+RADIUS_PERCENTILE = 90
+
+# Keeps the estimate finite for clusters whose radius approaches 90 degrees
+_MIN_RADIUS_COS = 0.05
+
+class DomainGate:
+    """K-means centroids + angular radii giving a cheap estimate of a query's best corpus score"""
+    def __init__(self, centroids, radii):
+        self.centroids = np.ascontiguousarray(centroids, dtype="float32")
+        self.radii = np.asarray(radii, dtype="float32")
+        self._radius_cos = np.maximum(np.cos(self.radii), _MIN_RADIUS_COS).astype("float32")
+
+    def __len__(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, embeddings, n_centroids=None, niter=20, seed=123, radius_percentile=RADIUS_PERCENTILE):
+        """Spherical k-means over normalized embeddings plus a percentile angular radius per cluster"""
+        embeddings = normalize_embeddings(embeddings)
+        count, dim = embeddings.shape
+        if n_centroids is None:
+            # FAISS wants ~39 points per centroid; a few hundred centroids is plenty for a yes/no gate
+            n_centroids = min(256, max(1, count // 39))
+        n_centroids = min(n_centroids, count)
+
+        kmeans = faiss.Kmeans(dim, n_centroids, niter=niter, spherical=True, seed=seed, verbose=False)
+        kmeans.train(embeddings)
+        centroids = normalize_embeddings(kmeans.centroids)
+
+        index = faiss.IndexFlatIP(dim)
+        index.add(centroids)
+        sims, assignment = index.search(embeddings, 1)
+        angles = np.arccos(np.clip(sims[:, 0], -1.0, 1.0))
+        radii = np.zeros(n_centroids, dtype="float32")
+        for c in range(n_centroids):
+            members = angles[assignment[:, 0] == c]
+            if len(members):
+                radii[c] = np.percentile(members, radius_percentile)
+        return cls(centroids, radii)
+
+    def estimate(self, query_embeddings):
+        """Estimated best cosine any corpus document reaches, per query row (not a bound; see RAG_DOMAIN_GATE_MARGIN)"""
+        # A document at angle r from centroid c is cos(r) * c plus a part orthogonal to c that a query in 384 dims
+        # rarely lines up with, so q.doc ~ (q.c) / cos(r_c). The exact triangle-inequality bound cos(angle(q, c) - r_c)
+        # never drops below ~0.7 here, so it could not reject anything
+        query_embeddings = normalize_embeddings(query_embeddings)
+        return ((query_embeddings @ self.centroids.T) / self._radius_cos).max(axis=1)
+
+    def save(self, path):
+        np.save(os.path.join(path, DOMAIN_CENTROIDS_FILE), self.centroids)
+        np.save(os.path.join(path, DOMAIN_RADII_FILE), self.radii)
+
+    @classmethod
+    def load(cls, path):
+        """None if the store was written before the gate existed"""
+        centroids_path = os.path.join(path, DOMAIN_CENTROIDS_FILE)
+        if not os.path.exists(centroids_path):
+            return None
+        return cls(np.load(centroids_path), np.load(os.path.join(path, DOMAIN_RADII_FILE)))
@@ -0,0 +1,74 @@
+# rag_service/embedder.py
+import numpy as np
+
+EMBEDDER_BACKENDS = ("torch", "torch-int8", "onnx")
+
+class TorchEmbedder:
+    """Stock SentenceTransformer on PyTorch eager mode (reference backend)"""
+    backend = "torch"
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(self, texts, batch_size=32):
+        """Normalized float32 embeddings, one row per text"""
+        embeddings = self.model.encode(
+            list(texts), batch_size=batch_size, convert_to_numpy=True, normalize_embeddings=True
+        )
+        return np.asarray(embeddings, dtype="float32")
+
+class QuantizedTorchEmbedder(TorchEmbedder):
+    """Same model with its Linear layers dynamically quantized to int8 (weights int8, activations quantized per batch)"""
+    backend = "torch-int8"
+
+    def __init__(self, model_name):
+        import torch
+        super().__init__(model_name)
+        self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+class OnnxEmbedder(TorchEmbedder):
+    """Same model exported to ONNX and run by onnxruntime (needs optimum[onnxruntime])"""
+    backend = "onnx"
+
+    def __init__(self, model_name, file_name=None):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        # Without file_name the graph is exported from the checkpoint on first load; a prebuilt
+        # (e.g. onnx/model_qint8_avx512_vnni.onnx) can be selected by name
+        model_kwargs = {"file_name": file_name} if file_name else None
+        self.model = SentenceTransformer(model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+
+def create_embedder(backend, model_name, onnx_file=None, fallback=True):
+    """Build the configured backend; falls back to the torch reference if the optional runtime is missing"""
+    if backend not in EMBEDDER_BACKENDS:
+        raise ValueError(f"Unknown embedder backend '{backend}', expected one of {EMBEDDER_BACKENDS}")
+
+    try:
+        if backend == "onnx":
+            embedder = OnnxEmbedder(model_name, file_name=onnx_file)
+        elif backend == "torch-int8":
+            embedder = QuantizedTorchEmbedder(model_name)
+        else:
+            embedder = TorchEmbedder(model_name)
+    except Exception as e:
+        if not fallback or backend == "torch":
+            raise
+        print(f"Embedder backend '{backend}' unavailable ({e}), falling back to torch")
+        embedder = TorchEmbedder(model_name)
+
+    print(f"Query embedder ready: {model_name} on {embedder.backend}")
+    return embedder
+
+def check_parity(candidate, reference, texts, min_cosine=0.99):
+    """Cosine agreement between two embedders on the same texts; the corpus was built with the reference"""
+    a = candidate.encode(texts)
+    b = reference.encode(texts)
+    cosines = np.sum(a * b, axis=1)
+    return {
+        "texts": len(texts),
+        "min_cosine": float(cosines.min()),
+        "mean_cosine": float(cosines.mean()),
+        "passed": bool(cosines.min() >= min_cosine),
+    }
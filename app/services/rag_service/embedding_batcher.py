@@ -0,0 +1,129 @@
+# rag_service/embedding_batcher.py
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+import numpy as np
+
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+# A request arriving this many wait windows after the previous one is treated as sparse traffic
+IDLE_GAP_WINDOWS = 10
+
+class EmbeddingBatcher:
+    """Collects concurrent single-query encode requests for a few ms and runs them as one transformer batch"""
+    def __init__(self, encode_fn, max_batch=32, max_wait_ms=5.0, history=1000):
+        self.encode_fn = encode_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.idle_gap = self.max_wait * IDLE_GAP_WINDOWS
+        self._last_enqueued = float("-inf")  # worker thread only
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._worker.start()
+
+        # Metrics
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.skipped_waits = 0
+        self._size_histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self._size_histogram["more"] = 0
+        self._waits = deque(maxlen=history)    # seconds from submit to encode start
+        self._encode_times = deque(maxlen=history)
+
+    def submit(self, text) -> Future:
+        """Queue a text; the Future resolves to its float32 embedding"""
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def encode(self, text, timeout=None) -> np.ndarray:
+        """Blocking single-text encode through the shared batch"""
+        return self.submit(text).result(timeout=timeout)
+
+    def _collect(self):
+        # Block for the first request, then gather more until the batch is full or the wait expires
+        batch = [self._queue.get()]
+        enqueued = batch[0][2]
+        sparse = enqueued - self._last_enqueued > self.idle_gap
+        self._last_enqueued = enqueued
+        if sparse and self._queue.empty():
+            # Nothing arrived recently, so nothing is likely to join: encode now instead of
+            # charging a lone request the whole window; a burst batches from its second request on
+            with self._lock:
+                self.skipped_waits += 1
+            return batch
+
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        self._last_enqueued = batch[-1][2]
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+
+            # Identical texts in one window are encoded once
+            unique = {}
+            for text, _, _ in batch:
+                unique.setdefault(text, len(unique))
+
+            try:
+                embeddings = self.encode_fn(list(unique))
+            except Exception as e:
+                print(f"Embedding batch error: {e}")
+                with self._lock:
+                    self.errors += 1
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+
+            for text, future, _ in batch:
+                future.set_result(np.asarray(embeddings[unique[text]], dtype="float32"))
+            self._record(batch, started, time.perf_counter() - started)
+
+    def _record(self, batch, started, encode_time):
+        with self._lock:
+            self.batches += 1
+            self.items += len(batch)
+            bucket = next((b for b in BATCH_SIZE_BUCKETS if len(batch) <= b), "more")
+            self._size_histogram[bucket] += 1
+            self._waits.extend(started - enqueued for _, _, enqueued in batch)
+            self._encode_times.append(encode_time)
+
+    def stats(self):
+        with self._lock:
+            waits = np.array(self._waits) * 1000
+            encode_times = np.array(self._encode_times) * 1000
+            return {
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": self.batches,
+                "items": self.items,
+                "errors": self.errors,
+                "skipped_waits": self.skipped_waits,
+                "queued": self._queue.qsize(),
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+                "batch_size_histogram": {str(k): v for k, v in self._size_histogram.items()},
+                "queue_wait_ms": _percentiles(waits),
+                "encode_ms": _percentiles(encode_times),
+            }
+
+def _percentiles(values):
+    if not len(values):
+        return {"p50": 0.0, "p90": 0.0, "p99": 0.0}
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {"p50": round(float(p50), 3), "p90": round(float(p90), 3), "p99": round(float(p99), 3)}
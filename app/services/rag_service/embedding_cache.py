@@ -0,0 +1,174 @@
+# rag_service/embedding_cache.py
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+def normalize_query(text: str) -> str:
+    """Cache key text: lowercase, collapsed whitespace, no trailing punctuation"""
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip("?!. ")
+
+class EmbeddingCache:
+    """Query embedding cache with an in-memory LRU tier and an optional sqlite tier"""
+    def __init__(self, max_items=2048, db_path=None, max_disk_items=100000, model_name=""):
+        self.max_items = max_items
+        self.max_disk_items = max_disk_items
+        self.model_name = model_name
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings(last_used)")
+            self._db.commit()
+
+    def _key(self, text):
+        # Model name is part of the key so a model swap never serves stale vectors
+        raw = f"{self.model_name}\0{normalize_query(text)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _remember(self, key, embedding):
+        # Caller holds the lock
+        self._items[key] = embedding
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, text):
+        key = self._key(text)
+        with self._lock:
+            embedding = self._items.get(key)
+            if embedding is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return embedding
+
+            if self._db is not None:
+                row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    embedding = np.frombuffer(row[0], dtype="float32")
+                    self._db.execute("UPDATE embeddings SET last_used = ? WHERE key = ?", (time.time(), key))
+                    self._db.commit()
+                    self._remember(key, embedding)
+                    self.disk_hits += 1
+                    return embedding
+
+            self.misses += 1
+            return None
+
+    def put(self, text, embedding):
+        embedding = np.array(embedding, dtype="float32")
+        embedding.setflags(write=False)
+        key = self._key(text)
+        with self._lock:
+            self._remember(key, embedding)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                    (key, embedding.tobytes(), time.time())
+                )
+                self._evict_disk()
+                self._db.commit()
+        return embedding
+
+    def _evict_disk(self):
+        # Caller holds the lock; drop least recently used rows over the limit
+        count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        overflow = count - self.max_disk_items
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (overflow,)
+            )
+            self.disk_evictions += overflow
+
+    def get_or_compute(self, text, compute_fn):
+        """Return the cached embedding for text, computing and storing it on a miss"""
+        embedding = self.get(text)
+        if embedding is None:
+            embedding = self.put(text, compute_fn(text))
+        return embedding
+
+    def get_or_compute_many(self, texts, compute_batch_fn):
+        """Embeddings for texts in order; all misses are computed in a single batch call"""
+        embeddings = [self.get(text) for text in texts]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            computed = compute_batch_fn([texts[i] for i in missing])
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = self.put(texts[i], embedding)
+        return embeddings
+
+    def warm(self, queries, compute_batch_fn, batch_size=64):
+        """Embed every uncached query in batches; returns how many were added"""
+        seen, pending = set(), []
+        for query in queries:
+            key = normalize_query(query)
+            if key and key not in seen:
+                seen.add(key)
+                pending.append(query)
+        pending = [q for q in pending if self.get(q) is None]
+
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            for query, embedding in zip(batch, compute_batch_fn(batch)):
+                self.put(query, embedding)
+        return len(pending)
+
+    def warm_from_log(self, log_path, compute_batch_fn, batch_size=64):
+        """Pre-warm from a query log: one query per line, or JSON lines with a "query" field"""
+        queries = []
+        with open(log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith("{"):
+                    try:
+                        line = json.loads(line).get("query", "")
+                    except ValueError:
+                        pass
+                queries.append(line)
+        return self.warm(queries, compute_batch_fn, batch_size=batch_size)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            stats = {
+                "memory_items": len(self._items),
+                "max_items": self.max_items,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+            if self._db is not None:
+                stats["disk_items"] = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return stats
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
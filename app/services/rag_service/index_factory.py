@@ -0,0 +1,98 @@
+# rag_service/index_factory.py
+import math
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
+
+# Stored vector precision; int8 uses per-dimension min/max scales (QT_8bit)
+EMBEDDING_DTYPES = {
+    "float32": None,
+    "float16": faiss.ScalarQuantizer.QT_fp16,
+    "int8": faiss.ScalarQuantizer.QT_8bit,
+}
+
+def default_nlist(count):
+    """IVF list count: ~4*sqrt(n), capped so every list gets enough training points"""
+    return max(1, min(int(4 * math.sqrt(count)), count // 39))
+
+def _pq_params(dim, count, pq_m=None, nbits=8):
+    # Sub-quantizers must divide dim; 8 dims per code byte is a good default
+    if pq_m is None:
+        pq_m = next(m for m in (48, 32, 24, 16, 12, 8, 4, 2, 1) if dim % m == 0)
+    # 2^nbits centroids need ~39 training points each
+    nbits = max(1, min(nbits, int(math.log2(max(count // 39, 2)))))
+    return pq_m, nbits
+
+def build_index(embeddings, index_type="flat", dtype="float32", nlist=None, hnsw_m=32, ef_construction=80,
+                pq_m=None, nbits=8):
+    """Build (and train) an inner-product index over normalized float32 embeddings"""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+    if dtype not in EMBEDDING_DTYPES:
+        raise ValueError(f"Unknown embedding dtype '{dtype}', expected one of {tuple(EMBEDDING_DTYPES)}")
+    qtype = EMBEDDING_DTYPES[dtype]
+
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    count, dim = embeddings.shape
+    metric = faiss.METRIC_INNER_PRODUCT
+
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dim) if qtype is None else faiss.IndexScalarQuantizer(dim, qtype, metric)
+    elif index_type == "hnsw":
+        if qtype is None:
+            index = faiss.IndexHNSWFlat(dim, hnsw_m, metric)
+        else:
+            index = faiss.IndexHNSWSQ(dim, qtype, hnsw_m, metric)
+        index.hnsw.efConstruction = ef_construction
+    else:
+        nlist = nlist or default_nlist(count)
+        quantizer = faiss.IndexFlatIP(dim)
+        if index_type == "ivf" and qtype is None:
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, metric)
+        elif index_type == "ivf":
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, qtype, metric)
+        else:
+            # Product quantization is already compressed; dtype does not apply
+            pq_m, nbits = _pq_params(dim, count, pq_m, nbits)
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, nbits, metric)
+
+    if not index.is_trained:
+        index.train(embeddings)
+    index.add(embeddings)
+    return index
+
+def configure_search(index, nprobe=None, ef_search=None):
+    """Apply query-time recall/latency knobs (no-op for index types that don't have them)"""
+    if nprobe is not None:
+        try:
+            faiss.extract_index_ivf(index).nprobe = nprobe
+        except RuntimeError:
+            pass
+    if ef_search is not None and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+    return index
+
+def index_dtype_of(index):
+    """Precision of the vectors stored in the index ("pq" for product-quantized codes)"""
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "pq"
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    sq = getattr(index, "sq", None)
+    if sq is not None:
+        for name, qtype in EMBEDDING_DTYPES.items():
+            if qtype == sq.qtype:
+                return name
+        return "sq"
+    return "float32"
+
+def index_type_of(index):
+    """Best-effort reverse mapping from a FAISS index object to our index type name"""
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivfpq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf"
+    return "flat"
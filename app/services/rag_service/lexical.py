@@ -0,0 +1,126 @@
+# rag_service/lexical.py
+import json
+import os
+import re
+from array import array
+from collections import Counter
+import numpy as np
+from .retrieval import top_k_indices
+
+BM25_INDPTR_FILE = "bm25_indptr.npy"
+BM25_DOC_IDS_FILE = "bm25_doc_ids.npy"
+BM25_IMPACTS_FILE = "bm25_impacts.npy"
+BM25_VOCAB_FILE = "bm25_vocab.json"
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Question words and glue that match most of the corpus and only slow queries down
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from how i if in is it its me my of on or should so that
+the their them there these this to was what when where which who why will with you your q
+""".split())
+
+def tokenize(text: str) -> list:
+    """Lowercase alphanumeric tokens without stopwords ("DOMS" -> "doms", "5x5" -> "5x5")"""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+class BM25Index:
+    """BM25 inverted index with CSR postings: per-term slices of doc ids and precomputed BM25 impacts"""
+    def __init__(self, terms, indptr, doc_ids, impacts, count, k1=1.2, b=0.75):
+        self.terms = terms
+        self.vocab = {term: i for i, term in enumerate(terms)}
+        self.indptr = indptr      # int64 (n_terms + 1,), postings of term t are [indptr[t], indptr[t + 1])
+        self.doc_ids = doc_ids    # int32 (n_postings,)
+        self.impacts = impacts    # float32 (n_postings,), idf * saturated tf for that (term, doc)
+        self.count = count
+        self.k1 = k1
+        self.b = b
+
+    def __len__(self):
+        return self.count
+
+    @classmethod
+    def build(cls, corpus, k1=1.2, b=0.75):
+        """Tokenize every document once; postings are collected in flat typed arrays, not per-term lists"""
+        vocab = {}
+        term_ids, doc_ids, tfs = array("i"), array("i"), array("f")
+        lengths = array("f")
+
+        for doc_id, text in enumerate(corpus):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+
+        count = len(lengths)
+        term_ids = np.frombuffer(term_ids, dtype="int32")
+        doc_ids = np.frombuffer(doc_ids, dtype="int32")
+        tfs = np.frombuffer(tfs, dtype="float32")
+        lengths = np.frombuffer(lengths, dtype="float32")
+
+        # Group postings by term (stable, so each posting list stays sorted by doc id)
+        order = np.argsort(term_ids, kind="stable")
+        term_ids, doc_ids, tfs = term_ids[order], doc_ids[order], tfs[order]
+        df = np.bincount(term_ids, minlength=len(vocab))
+        indptr = np.zeros(len(vocab) + 1, dtype="int64")
+        np.cumsum(df, out=indptr[1:])
+
+        # Precompute per-posting BM25 impacts so a query is just gather + sum
+        avgdl = float(lengths.mean()) if count and lengths.mean() > 0 else 1.0
+        idf = np.log1p((count - df + 0.5) / (df + 0.5)).astype("float32")
+        norm = k1 * (1 - b + b * lengths[doc_ids] / avgdl)
+        impacts = (idf[term_ids] * tfs * (k1 + 1) / (tfs + norm)).astype("float32")
+
+        terms = [None] * len(vocab)
+        for term, i in vocab.items():
+            terms[i] = term
+        return cls(terms, indptr, np.ascontiguousarray(doc_ids), impacts, count, k1=k1, b=b)
+
+    def search(self, query: str, top_k=10):
+        """(doc_ids, scores) of the top_k BM25 matches, best first"""
+        postings = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not postings:
+            return np.zeros(0, dtype="int64"), np.zeros(0, dtype="float32")
+
+        doc_ids = np.concatenate([self.doc_ids[self.indptr[t]:self.indptr[t + 1]] for t in postings])
+        impacts = np.concatenate([self.impacts[self.indptr[t]:self.indptr[t + 1]] for t in postings])
+        # Sum impacts per matching doc only; never touches a corpus-sized score array
+        docs, inverse = np.unique(doc_ids, return_inverse=True)
+        scores = np.bincount(inverse, weights=impacts).astype("float32")
+
+        top = top_k_indices(scores, top_k)
+        return docs[top].astype("int64"), scores[top]
+
+    def memory_bytes(self):
+        """Approximate resident size: postings arrays plus the term dictionary"""
+        arrays = self.indptr.nbytes + self.doc_ids.nbytes + self.impacts.nbytes
+        # str object + dict slot + list slot per term
+        vocab = sum(49 + len(t) for t in self.terms) + len(self.terms) * (8 + 8 * 3)
+        return arrays + vocab
+
+    def save(self, path):
+        np.save(os.path.join(path, BM25_INDPTR_FILE), self.indptr)
+        np.save(os.path.join(path, BM25_DOC_IDS_FILE), self.doc_ids)
+        np.save(os.path.join(path, BM25_IMPACTS_FILE), self.impacts)
+        with open(os.path.join(path, BM25_VOCAB_FILE), "w", encoding="utf-8") as f:
+            json.dump({"count": self.count, "k1": self.k1, "b": self.b, "terms": self.terms}, f)
+
+    @classmethod
+    def load(cls, path):
+        """Open a saved index with the postings mmapped; None if the store has none"""
+        vocab_path = os.path.join(path, BM25_VOCAB_FILE)
+        if not os.path.exists(vocab_path):
+            return None
+        with open(vocab_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            data["terms"],
+            np.load(os.path.join(path, BM25_INDPTR_FILE), mmap_mode="r"),
+            np.load(os.path.join(path, BM25_DOC_IDS_FILE), mmap_mode="r"),
+            np.load(os.path.join(path, BM25_IMPACTS_FILE), mmap_mode="r"),
+            data["count"],
+            k1=data["k1"],
+            b=data["b"]
+        )
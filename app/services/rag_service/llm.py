@@ -1,10 +1,18 @@
+import hashlib
 from google import genai
 from google.genai import types
 from fastapi import HTTPException
-from app.config import GOOGLE_API_KEY, GEMINI_TEXT_MODEL
+from app.config import GOOGLE_API_KEY, GEMINI_TEXT_MODEL, RAG_SINGLE_FLIGHT_TIMEOUT
+from .context_builder import build_context
+from .single_flight import SingleFlight
 
 _language_model_instance = None
 
+# Fallback replies (not real answers, so callers must not cache them)
+NO_ANSWER_MESSAGE = "Sorry, I couldn't generate an answer."
+ERROR_MESSAGE = "I'm having trouble responding right now."
+FALLBACK_MESSAGES = (NO_ANSWER_MESSAGE, ERROR_MESSAGE)
+
 class LanguageModelService:
     def __init__(self):
         try:
@@ -13,6 +21,8 @@ class LanguageModelService:
         except Exception as e:
             print(f"Gemini error: {e}")
             self.client = None
+        # Identical prompts in flight at the same time make one Gemini call
+        self.flight = SingleFlight("Gemini single-flight", timeout=RAG_SINGLE_FLIGHT_TIMEOUT)
 
     def is_available(self):
         return self.client is not None
@@ -20,8 +30,41 @@ class LanguageModelService:
     def generate_answer(self, query, context):
         if not self.is_available():
             raise HTTPException(status_code=500, detail="Language model service not available")
-            
-        prompt = f"""
+
+        prompt = build_prompt(query, context)
+        key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return self.flight.do(key, lambda: self._generate(prompt))
+
+    def _generate(self, prompt):
+        try:
+            response = self.client.models.generate_content(
+                model=GEMINI_TEXT_MODEL,
+                contents=prompt,
+                config=_generation_config()
+            )
+            return response.text.strip() if response.text else NO_ANSWER_MESSAGE
+        except Exception as e:
+            print(f"Gemini error: {e}")
+            return ERROR_MESSAGE
+
+    def stream_answer(self, query, context):
+        """Yield answer text chunks as Gemini produces them (errors propagate to the caller)"""
+        if not self.is_available():
+            raise HTTPException(status_code=500, detail="Language model service not available")
+
+        for chunk in self.client.models.generate_content_stream(
+            model=GEMINI_TEXT_MODEL,
+            contents=build_prompt(query, context),
+            config=_generation_config()
+        ):
+            if chunk.text:
+                yield chunk.text
+
+def build_prompt(query, context):
+    # Raw passage lists are assembled under the context token budget
+    if not isinstance(context, str):
+        context = build_context(query, context)["text"]
+    return f"""
         You are a helpful fitness assistant. Respond ONLY in plain text.
         Do not use Markdown, HTML, bullet points, headings, or any special formatting.
         Keep your answer concise, clear, and under 50 words.
@@ -36,19 +79,10 @@ class LanguageModelService:
         Answer:
         """
 
-        # print(prompt)
-        try:
-            response = self.client.models.generate_content(
-                model=GEMINI_TEXT_MODEL,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    thinking_config=types.ThinkingConfig(thinking_budget=0)
-                )
-            )
-            return response.text.strip() if response.text else "Sorry, I couldn't generate an answer."
-        except Exception as e:
-            print(f"Gemini error: {e}")
-            return "I'm having trouble responding right now."
+def _generation_config():
+    return types.GenerateContentConfig(
+        thinking_config=types.ThinkingConfig(thinking_budget=0)
+    )
 
 def get_language_model_service():
     global _language_model_instance
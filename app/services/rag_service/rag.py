@@ -1,67 +1,324 @@
 from fastapi import HTTPException
-from .similarity import SimilarityService
-from .retrieval import Retriever
-from .llm import get_language_model_service
-from ddgs import DDGS
+from .sharding import Shard, ShardedRetriever, shard_specs
+from .similarity import embed_query, embed_queries
+from .corpus_store import corpus_version
+from .llm import get_language_model_service, FALLBACK_MESSAGES, ERROR_MESSAGE, NO_ANSWER_MESSAGE
+from .embedding_cache import normalize_query
+from .answer_cache import SemanticAnswerCache
+from .context_builder import build_context
+from .single_flight import SingleFlight
+from app.config import (
+    RAG_ANSWER_CACHE_SIZE, RAG_ANSWER_CACHE_MAX_DISTANCE, RAG_ANSWER_CACHE_TTL,
+    RAG_DIRECT_ANSWER, RAG_DIRECT_ANSWER_THRESHOLD, RAG_BATCH_CONCURRENCY, RAG_RELOAD_WATCH_INTERVAL,
+    RAG_SINGLE_FLIGHT_TIMEOUT, RAG_LEXICAL_MIN_SCORE, RAG_DOMAIN_GATE_MARGIN
+)
+import gc
+import numpy as np
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .web_search import get_web_search_service
+from .web_index import get_web_snippet_index
 
-# Global singleton instance
+# Global singleton instance (swapped atomically by reload_rag_service)
 _rag_service_instance = None
+_rag_service_lock = threading.Lock()
+_reload_thread = None
+_watch_thread = None
+_reload_status = {
+    "state": "idle",        # idle, building or failed
+    "generation": 0,        # number of services built so far
+    "shard": None,          # shard being rebuilt (None = whole service)
+    "versions": {},         # shard name -> corpus version the live service was built from
+    "started_at": None,
+    "finished_at": None,
+    "error": None,
+}
+
+def split_qa(text: str):
+    """Split a "Q: ...\nA: ..." corpus entry into (question, answer); (None, text) otherwise"""
+    match = re.match(r"\s*Q:\s*(.*?)\s*\nA:\s*(.*)", text, re.DOTALL)
+    if not match:
+        return None, text.strip()
+    return match.group(1), match.group(2).strip()
+
+def trim_to_words(text: str, max_words: int) -> str:
+    """Trim to at most max_words, preferring whole sentences"""
+    if not max_words or len(text.split()) <= max_words:
+        return text
+
+    trimmed, count = [], 0
+    for sentence in re.split(r"(?<=[.!?])\s+", text):
+        words = len(sentence.split())
+        if count + words > max_words:
+            break
+        trimmed.append(sentence)
+        count += words
+
+    if trimmed:
+        return " ".join(trimmed)
+    # First sentence alone is over budget: cut mid-sentence
+    return " ".join(text.split()[:max_words]).rstrip(",;:") + "..."
 
 class RAGService:
     def __init__(self, threshold: float = 0.3):
-        # Load dataset embeddings
-        self.similarity = SimilarityService()
-        corpus, embeddings = self.similarity.get_corpus()
+        # Load each corpus shard (one "default" shard unless RAG_SHARDS names several) and its retriever
+        # Query embedding is module-level (cache + encoder), so no shard's SimilarityService is held here:
+        # a reloaded shard's old index and mmaps are released as soon as the retriever drops it
+        self.retriever = ShardedRetriever([Shard(name, path, weight) for name, path, weight in shard_specs()])
 
-        # Init retriever + Gemini
-        self.retriever = Retriever(corpus, embeddings)
+        # Init Gemini
         self.llm = get_language_model_service()
+        self.web_search = get_web_search_service()
+        self.web_index = get_web_snippet_index()
         self.threshold = threshold
+        # Concurrent identical questions share one retrieval + generation
+        self.flight = SingleFlight("RAG single-flight", timeout=RAG_SINGLE_FLIGHT_TIMEOUT)
 
-    def hybrid_rag_answer(self, query: str, top_k: int = 3) -> dict:
-        # 0. Check if query is in fitness/health domain
-        in_domain, best_idx, sim_score = self.similarity.check_domain_relevance(
-            query, threshold=self.threshold
+        # Paraphrase-tolerant answer cache; tied to these indexes because context keys are (shard, id) pairs
+        self.answer_cache = SemanticAnswerCache(
+            max_items=RAG_ANSWER_CACHE_SIZE,
+            max_distance=RAG_ANSWER_CACHE_MAX_DISTANCE,
+            ttl_seconds=RAG_ANSWER_CACHE_TTL
         )
-        
-        if not in_domain:
+
+    def hybrid_rag_answer(self, query: str, top_k: int = 3, max_words: int = None, direct_answer: bool = None,
+                          shards: list = None) -> dict:
+        # Unknown shard names fail fast, before joining or starting a flight
+        self.retriever.select(shards)
+
+        def run():
+            # 0. Embed query once and run a single index search; the best hit doubles as the domain gate
+            query_embedding = embed_query(query)
+            hits = self._search(query_embedding, query, top_k, shards)
+            return self._answer(query, query_embedding, hits, top_k, max_words, direct_answer)
+
+        return self.flight.do(self._flight_key(query, top_k, max_words, direct_answer, shards), run)
+
+    @staticmethod
+    def _flight_key(query, top_k, max_words, direct_answer, shards=None):
+        return (normalize_query(query), top_k, max_words, direct_answer, tuple(shards) if shards else None)
+
+    def batch_rag_answer(self, queries: list, top_k: int = 3, max_words: int = None, direct_answer: bool = None,
+                         shards: list = None, max_concurrency: int = RAG_BATCH_CONCURRENCY) -> list:
+        """Answer many queries: one encode call, one matrix search, bounded LLM concurrency; input order kept"""
+        # 0. Identical questions (after normalization) are answered once
+        unique, positions = [], []
+        slot_of = {}
+        for query in queries:
+            key = normalize_query(query)
+            if key not in slot_of:
+                slot_of[key] = len(unique)
+                unique.append(query)
+            positions.append(slot_of[key])
+
+        # 1. Embed and search all unique queries together
+        embeddings = embed_queries(unique)
+        hits = [[] for _ in unique]
+        in_domain = np.arange(len(unique))
+        estimates = self.retriever.estimate(embeddings, shards)
+        if estimates is not None:
+            in_domain = np.flatnonzero(estimates >= self.threshold - RAG_DOMAIN_GATE_MARGIN)
+        if len(in_domain):
+            batch_hits = self.retriever.query_batch(
+                embeddings[in_domain], top_k=top_k, query_texts=[unique[i] for i in in_domain], shards=shards
+            )
+            for i, query_hits in zip(in_domain, batch_hits):
+                hits[i] = query_hits
+        print(f"Batch RAG: {len(queries)} queries, {len(unique)} unique")
+
+        # 2. Generation is network-bound, so answer with a small worker pool
+        def answer(i):
+            try:
+                return self.flight.do(
+                    self._flight_key(unique[i], top_k, max_words, direct_answer, shards),
+                    lambda: self._answer(unique[i], embeddings[i], hits[i], top_k, max_words, direct_answer)
+                )
+            except Exception as e:
+                print(f"Batch RAG error for '{unique[i]}': {e}")
+                return {"answer": ERROR_MESSAGE, "source": "error", "results": []}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(unique)))) as executor:
+            answers = list(executor.map(answer, range(len(unique))))
+        return [answers[slot] for slot in positions]
+
+    def stream_rag_answer(self, query: str, top_k: int = 3, max_words: int = None, direct_answer: bool = None,
+                          shards: list = None):
+        """Yield ("meta", retrieval info) as soon as retrieval is done, then ("token", text) chunks, then ("done", result)"""
+        query_embedding = embed_query(query)
+        hits = self._search(query_embedding, query, top_k, shards)
+        plan = self._retrieve(query, query_embedding, hits, top_k, max_words, direct_answer)
+
+        meta = {"source": plan["source"], "results": plan["results"], "mode": plan.get("mode", "generated")}
+        if "context" in plan:
+            meta["context_tokens"] = plan["context"]["tokens"]
+        yield "meta", meta
+
+        # Out of domain, direct or cached answer: nothing to generate
+        if "answer" in plan:
+            yield "token", plan["answer"]
+            yield "done", plan
+            return
+
+        chunks = []
+        try:
+            for chunk in self.llm.stream_answer(query=query, context=plan["context"]["text"]):
+                chunks.append(chunk)
+                yield "token", chunk
+        except HTTPException:
+            raise
+        except Exception as e:
+            print(f"Gemini stream error: {e}")
+            if not chunks:
+                yield "token", ERROR_MESSAGE
+            # Partial or failed answers are never cached
+            yield "done", {"answer": "".join(chunks) or ERROR_MESSAGE, "source": plan["source"], "results": plan["results"]}
+            return
+
+        answer = "".join(chunks).strip()
+        if not answer:
+            answer = NO_ANSWER_MESSAGE
+            yield "token", answer
+        yield "done", self._finish(query_embedding, plan, answer)
+
+    def _search(self, query_embedding, query: str, top_k: int, shards: list = None) -> list:
+        """Retriever hits, or [] when the domain gates put the query clearly below the domain threshold"""
+        # Estimates near the threshold fall through to the full search, whose best hit makes the exact call
+        estimates = self.retriever.estimate(query_embedding, shards)
+        if estimates is not None and estimates[0] < self.threshold - RAG_DOMAIN_GATE_MARGIN:
+            print(f"Domain gate rejected query: estimated best score {estimates[0]:.4f} < {self.threshold} - {RAG_DOMAIN_GATE_MARGIN}")
+            return []
+        return self.retriever.query(query_embedding, top_k=top_k, query_text=query, shards=shards)
+
+    def _answer(self, query: str, query_embedding, hits: list, top_k: int, max_words: int = None,
+                direct_answer: bool = None) -> dict:
+        plan = self._retrieve(query, query_embedding, hits, top_k, max_words, direct_answer)
+        if "answer" in plan:
+            return plan
+
+        answer = self.llm.generate_answer(query=query, context=plan["context"]["text"])
+        return self._finish(query_embedding, plan, answer)
+
+    def _retrieve(self, query: str, query_embedding, hits: list, top_k: int, max_words: int = None,
+                  direct_answer: bool = None) -> dict:
+        """Everything before generation: a finished result (has "answer") or a plan with the context to send"""
+        # The best dense hit is always among the hits (hybrid retrieval never fuses it away)
+        best = max(hits, key=lambda hit: hit["score"]) if hits else None
+        sim_score = best["score"] if best else 0.0
+
+        print(f"Domain relevance score: {sim_score:.4f}, threshold: {self.threshold}")
+
+        # 1. Check if query is in fitness/health domain
+        if sim_score < self.threshold:
             return {
                 "answer": "Sorry, I can only answer fitness and health-related questions.",
                 "source": "none",
                 "results": []
             }
-            
-        # 1. Embed query
-        query_embedding = self.similarity.embed_query(query)
 
-        # 2. Retrieve from dataset
-        results = self.retriever.search(query_embedding, top_k=top_k)
+        # 2. Near-exact knowledge-base match: return the stored answer without calling the LLM
+        if direct_answer is None:
+            direct_answer = RAG_DIRECT_ANSWER
+        if direct_answer and sim_score >= RAG_DIRECT_ANSWER_THRESHOLD:
+            result = self._direct_answer(best, max_words)
+            if result is not None:
+                return result
+
+        # 3. Keep the dataset hits that clear the retrieval threshold; with RAG_LEXICAL_MIN_SCORE set, a strong
+        #    BM25 match only has to clear the domain threshold, since MiniLM blurs terms like "creatine" or "DOMS"
+        results, result_ids = [], []
+        for i, hit in enumerate(hits[:top_k]):
+            strong_lexical = RAG_LEXICAL_MIN_SCORE > 0 and hit.get("bm25", 0.0) >= RAG_LEXICAL_MIN_SCORE
+            if hit["score"] >= self.retriever.threshold or (strong_lexical and hit["score"] >= self.threshold):
+                results.append(hit["text"])
+                result_ids.append((hit["shard"], hit["id"]))
+                print(f"Cosine match {i+1}: score={hit['score']:.4f}")
+
+        # 4. Knowledge base missed: try web snippets learned from earlier fallbacks
+        web_hits = []
+        if not results and self.web_index is not None:
+            web_hits = self.web_index.search(query_embedding, top_k=top_k, threshold=self.retriever.threshold)
+
+        # 5. Semantic answer cache: a close paraphrase with the same context gets the same answer
+        if results:
+            context_key = tuple(sorted(result_ids))
+        elif web_hits:
+            context_key = ("web-index",) + tuple(sorted(h["id"] for h in web_hits))
+        else:
+            context_key = ("web", top_k)
+        cached = self.answer_cache.get(query_embedding, context_key)
+        if cached is not None:
+            return cached
 
         if results:
-            context = "\n".join(results)
-            answer = self.llm.generate_answer(query=query, context=context)
-            return {"answer": answer, "source": "Knowledge Base", "results": results}
+            return self._plan(query, "Knowledge Base", results, context_key)
+
+        if web_hits:
+            print(f"Web snippet index hit: {len(web_hits)} snippets, best score={web_hits[0]['score']:.4f}")
+            # Format source for Gemini - pass URLs as context/source for reference
+            return self._plan(query, [h["url"] for h in web_hits], [h["text"] for h in web_hits], context_key)
 
-        # 3. Web fallback
+        # 6. Web fallback (time-boxed, cached and coalesced per normalized query)
         web_results, urls = [], []
-        with DDGS() as ddgs:
-            for r in ddgs.text(query, max_results=top_k):
-                web_results.append(r["body"])
-                urls.append(r["href"])
+        for r in self.web_search.search(query, max_results=top_k):
+            web_results.append(r["body"])
+            urls.append(r["href"])
 
         if web_results:
-            context = "\n".join(web_results)
-            # Format source for Gemini - pass URLs as context/source for reference
-            answer = self.llm.generate_answer(query=query, context=context)
-            return {"answer": answer, "source": urls, "results": web_results}
+            # Keep vetted snippets so the next similar question is answered locally
+            if self.web_index is not None:
+                self.web_index.add_async(query_embedding, web_results, urls)
+            return self._plan(query, urls, web_results, context_key)
 
-        # 4. Nothing found (should rarely get here due to domain check)
+        # 7. Nothing found (should rarely get here due to domain check)
         return {
             "answer": "I don't have enough information to answer that fitness question.",
             "source": "none", 
             "results": []
         }
 
+    def _plan(self, query: str, source, results: list, context_key) -> dict:
+        # Prompt context is deduplicated and cut to the token budget; results keep the raw passages
+        context = build_context(query, results)
+        print(
+            f"Context: {context['passages']}/{len(results)} passages, ~{context['tokens']} tokens "
+            f"(from ~{context['source_tokens']})"
+        )
+        return {"source": source, "results": results, "context": context, "context_key": context_key}
+
+    def _finish(self, query_embedding, plan: dict, answer: str) -> dict:
+        result = {
+            "answer": answer,
+            "source": plan["source"],
+            "results": plan["results"],
+            "context_tokens": plan["context"]["tokens"]
+        }
+        if answer not in FALLBACK_MESSAGES:
+            self.answer_cache.put(query_embedding, plan["context_key"], result)
+        return result
+
+    def _direct_answer(self, hit: dict, max_words: int = None):
+        question, answer = split_qa(hit["text"])
+        if question is None or not answer:
+            return None
+
+        print(f"Direct knowledge-base answer: score={hit['score']:.4f}, shard={hit['shard']}, id={hit['id']}")
+        return {
+            "answer": trim_to_words(answer, max_words),
+            "source": "Knowledge Base",
+            "results": [hit["text"]],
+            "mode": "direct",
+            "match": {"id": hit["id"], "shard": hit["shard"], "question": question, "score": hit["score"]}
+        }
+
+def shard_versions() -> dict:
+    """Corpus version on disk for every configured shard"""
+    return {name: corpus_version(path) for name, path, _ in shard_specs()}
+
+def _live_versions(service) -> dict:
+    return {shard.name: shard.version for shard in service.retriever.shards()}
+
 # Singleton getter function
 def get_rag_service():
     global _rag_service_instance
@@ -71,9 +328,99 @@ def get_rag_service():
 
             if not llm_service.is_available():
                 raise HTTPException(status_code=500, detail="Language model in rag service not available")
-            # Create RAG service
-            _rag_service_instance = RAGService()
+            with _rag_service_lock:
+                if _rag_service_instance is None:
+                    # Create RAG service
+                    _rag_service_instance = RAGService()
+                    _reload_status.update(generation=1, versions=_live_versions(_rag_service_instance))
+            _start_corpus_watch()
     except Exception as e:
         print(f"Error initializing RAG service: {e}")
         raise HTTPException(status_code=500, detail="RAG service initialization failed")
     return _rag_service_instance
+
+def reload_rag_service(shard: str = None) -> bool:
+    """Rebuild the RAG service (or one shard) from disk in the background; False if a reload is already running"""
+    global _reload_thread
+    if shard is not None and shard not in [name for name, _, _ in shard_specs()]:
+        raise HTTPException(status_code=400, detail=f"Unknown shard '{shard}'")
+
+    with _rag_service_lock:
+        if _reload_thread is not None and _reload_thread.is_alive():
+            return False
+        _reload_status.update(state="building", shard=shard, started_at=time.time(), finished_at=None, error=None)
+        _reload_thread = threading.Thread(target=_rebuild_rag_service, args=(shard,), name="rag-reload", daemon=True)
+        _reload_thread.start()
+    return True
+
+def get_reload_status() -> dict:
+    with _rag_service_lock:
+        return dict(_reload_status, versions=dict(_reload_status["versions"]))
+
+def _rebuild_rag_service(shard_name=None):
+    global _rag_service_instance
+    started = time.time()
+    service = _rag_service_instance
+    try:
+        # 1. Build the replacement while the live service keeps answering
+        if shard_name is not None and service is not None:
+            spec = next(spec for spec in shard_specs() if spec[0] == shard_name)
+            new_shard = Shard(*spec)
+        else:
+            new_service = RAGService()
+    except Exception as e:
+        print(f"RAG reload failed, keeping the current service: {e}")
+        with _rag_service_lock:
+            _reload_status.update(state="failed", finished_at=time.time(), error=str(e))
+        return
+
+    # 2. Atomic swap: new requests get the new shard/service, in-flight ones finish on the reference they hold
+    with _rag_service_lock:
+        if shard_name is not None and service is not None:
+            old = service.retriever.select([shard_name])[0]
+            service.retriever.replace(new_shard)
+            # Cached answers cite (shard, id) pairs from the old version
+            service.answer_cache.clear()
+            versions = _live_versions(service)
+        else:
+            old, _rag_service_instance = _rag_service_instance, new_service
+            versions = _live_versions(new_service)
+        _reload_status.update(
+            state="idle",
+            generation=_reload_status["generation"] + 1,
+            versions=versions,
+            finished_at=time.time()
+        )
+    target = f"shard '{shard_name}'" if shard_name else "RAG service"
+    print(f"{target} reloaded in {time.time() - started:.1f}s (generation {_reload_status['generation']})")
+
+    # 3. The old index, mmaps and answer cache are freed once the last in-flight request drops them
+    #    (this thread's own references included, or the collect below could not reclaim them)
+    service = None
+    del old
+    gc.collect()
+
+def _start_corpus_watch():
+    global _watch_thread
+    if RAG_RELOAD_WATCH_INTERVAL <= 0 or _watch_thread is not None:
+        return
+    _watch_thread = threading.Thread(
+        target=_watch_corpus, args=(RAG_RELOAD_WATCH_INTERVAL,), name="rag-corpus-watch", daemon=True
+    )
+    _watch_thread.start()
+
+def _watch_corpus(interval):
+    """Poll each shard's corpus version and reload the shards corpus_builder (or generate_embeddings) replaced"""
+    attempted = {}
+    while True:
+        time.sleep(interval)
+        with _rag_service_lock:
+            live = dict(_reload_status["versions"])
+        for name, current in shard_versions().items():
+            # Only one attempt per version, so a broken corpus isn't rebuilt every interval
+            if current is not None and current != live.get(name) and current != attempted.get(name):
+                print(f"Shard '{name}' changed on disk, reloading it")
+                if reload_rag_service(shard=name):
+                    attempted[name] = current
+                # One reload at a time; other changed shards are picked up on the next polls
+                break
@@ -1,29 +1,148 @@
 import faiss
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+from concurrent.futures import ThreadPoolExecutor
+from .index_factory import build_index, configure_search, index_type_of, index_dtype_of
+
+def normalize_embeddings(embeddings):
+    """L2-normalize embeddings (float32, in place) so inner product equals cosine similarity"""
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    if not embeddings.flags.writeable:
+        # e.g. a row of the read-only mmapped corpus store
+        embeddings = embeddings.copy()
+    if embeddings.ndim == 1:
+        embeddings = embeddings.reshape(1, -1)
+    faiss.normalize_L2(embeddings)
+    return embeddings
+
+def top_k_indices(scores, k):
+    """Indices of the k highest scores, best first (partial selection, only k items sorted)"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype="int64")
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates])]
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse ranked id lists by sum(1 / (k + rank)); returns [(id, score)] best first"""
+    fused = {}
+    for ranking in rankings:
+        for rank, idx in enumerate(ranking):
+            fused[int(idx)] = fused.get(int(idx), 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: -item[1])
 
 class Retriever:
-    def __init__(self, corpus, embeddings):
+    def __init__(self, corpus, embeddings, threshold=0.65, index=None, index_type="flat", nprobe=None, ef_search=None,
+                 dtype="float32", rerank_factor=4, lexical=None, fusion_k=60, fusion_candidates=20):
         self.corpus = corpus
-        self.embeddings = embeddings.astype("float32")
-
-        dim = embeddings.shape[1]
-        self.index = faiss.IndexFlatL2(dim)
-        self.index.add(self.embeddings)
-
-    def search(self, query_embedding, top_k=3, threshold=0.65):
-        # Cosine similarity search with threshold
-        query_embedding = query_embedding.reshape(1, -1)
-        sims = cosine_similarity(query_embedding, self.embeddings)[0]
-        
-        # Sort by similarity and apply threshold
-        indices = sims.argsort()[::-1]
-        results = []
-        
-        for i, idx in enumerate(indices[:top_k]):
-            if sims[idx] >= threshold:
-                results.append(self.corpus[idx])
-                print(f"Cosine match {i+1}: score={sims[idx]:.4f}")
-            
-        return results
-        
+        self.threshold = threshold
+        self.rerank_factor = rerank_factor
+
+        # Optional BM25 index, searched alongside the dense index and fused by reciprocal rank
+        self.lexical = lexical
+        self.fusion_k = fusion_k
+        self.fusion_candidates = fusion_candidates
+        self._lexical_executor = None
+        if lexical is not None:
+            self._lexical_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bm25")
+
+        # Shares the SimilarityService matrix (mmapped store or normalized pickle array); never copied here
+        if index is not None:
+            # Prebuilt (mmapped) index from the corpus store; embeddings are already normalized
+            self.embeddings = embeddings
+            self.index = index
+        else:
+            # Inner product over normalized vectors == cosine similarity
+            self.embeddings = normalize_embeddings(embeddings)
+            self.index = build_index(self.embeddings, index_type=index_type, dtype=dtype)
+            if isinstance(self.index, faiss.IndexFlat):
+                # Serve the matrix straight from the FAISS storage so only one float32 copy stays alive
+                count, dim = self.embeddings.shape
+                self.embeddings = faiss.rev_swig_ptr(self.index.get_xb(), count * dim).reshape(count, dim)
+
+        self.index_type = index_type_of(self.index)
+        self.index_dtype = index_dtype_of(self.index)
+        # Lossy codes (float16/int8/PQ) are re-scored against the float32 matrix
+        self.rerank = self.index_dtype != "float32" and self.embeddings is not None
+        configure_search(self.index, nprobe=nprobe, ef_search=ef_search)
+        mode = "hybrid" if lexical is not None else "dense"
+        print(f"Retriever ready: {self.index.ntotal} vectors, index={self.index_type}, dtype={self.index_dtype}, {mode}")
+
+    def query(self, query_embedding, top_k=3, query_text=None):
+        """Single index search returning the top_k hits with their cosine scores (hybrid when query_text is given)"""
+        query_texts = None if query_text is None else [query_text]
+        return self.query_batch(query_embedding, top_k=top_k, query_texts=query_texts)[0]
+
+    def query_batch(self, query_embeddings, top_k=3, query_texts=None):
+        """Search a (n, dim) matrix of queries in one index call; one hit list per row"""
+        query_embeddings = normalize_embeddings(query_embeddings)
+        k = min(max(top_k, 1), self.index.ntotal)
+        if k == 0:
+            return [[] for _ in range(len(query_embeddings))]
+
+        if self.lexical is None or query_texts is None:
+            return [
+                [{"id": int(idx), "score": float(score), "text": self.corpus[idx]} for score, idx in zip(scores, ids)]
+                for scores, ids in self._dense_batch(query_embeddings, k)
+            ]
+
+        # BM25 runs on its worker while FAISS searches here; both spend their time outside the GIL
+        depth = min(max(k, self.fusion_candidates), self.index.ntotal)
+        lexical_future = self._lexical_executor.submit(
+            lambda: [self.lexical.search(text, top_k=depth) for text in query_texts]
+        )
+        dense = self._dense_batch(query_embeddings, depth)
+        lexical = lexical_future.result()
+
+        batch = []
+        for query_embedding, (scores, ids), (lexical_ids, lexical_scores) in zip(query_embeddings, dense, lexical):
+            fused = dict(reciprocal_rank_fusion([ids, lexical_ids], k=self.fusion_k))
+            cosine = dict(zip(ids.tolist(), scores.tolist()))
+            missing = np.array(sorted(idx for idx in fused if idx not in cosine), dtype="int64")
+            if len(missing):
+                # Lexical-only hits still report a cosine score, so thresholds keep their meaning
+                cosine.update(zip(missing.tolist(), self._exact_scores(missing, query_embedding).tolist()))
+
+            # Dense hits that clear the threshold keep their slots (best cosine first, so the best dense hit
+            # always leads); fusion only orders the remaining slots, where strong BM25 matches compete
+            best = int(ids[0]) if len(ids) else None
+            ranked = sorted(fused, key=lambda idx: (
+                (0, -cosine[idx]) if idx == best or cosine[idx] >= self.threshold else (1, -fused[idx])
+            ))[:k]
+
+            bm25 = dict(zip(lexical_ids.tolist(), lexical_scores.tolist()))
+            batch.append([
+                {"id": idx, "score": float(cosine[idx]), "text": self.corpus[idx], "fused": fused[idx],
+                 "lexical": idx in bm25, "bm25": float(bm25.get(idx, 0.0))}
+                for idx in ranked
+            ])
+        return batch
+
+    def _dense_batch(self, query_embeddings, k):
+        """(scores, ids) per query from the dense index, float32 re-ranked for lossy codes"""
+        # FAISS keeps a k-sized heap per query, so the full score array is never sorted
+        fetch = min(k * self.rerank_factor, self.index.ntotal) if self.rerank else k
+        all_scores, all_ids = self.index.search(query_embeddings, fetch)
+
+        batch = []
+        for query_embedding, scores, ids in zip(query_embeddings, all_scores, all_ids):
+            valid = ids >= 0
+            scores, ids = scores[valid], ids[valid]
+
+            if self.rerank and len(ids):
+                # Exact float32 scores for the candidates only (pages in just these rows of the mmapped matrix)
+                ids = np.sort(ids)
+                scores = self._exact_scores(ids, query_embedding)
+                order = top_k_indices(scores, k)
+                scores, ids = scores[order], ids[order]
+            batch.append((scores, ids))
+        return batch
+
+    def _exact_scores(self, ids, query_embedding):
+        if self.embeddings is not None:
+            vectors = np.asarray(self.embeddings[ids], dtype="float32")
+        else:
+            vectors = np.vstack([self.index.reconstruct(int(idx)) for idx in ids])
+        return vectors @ query_embedding
@@ -0,0 +1,148 @@
+# rag_service/sharding.py
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from fastapi import HTTPException
+from .similarity import SimilarityService
+from .retrieval import Retriever
+from .corpus_store import corpus_version
+from app.config import (
+    RAG_SHARDS, RAG_SHARDS_DIR, RAG_INDEX_TYPE, RAG_INDEX_NPROBE, RAG_INDEX_EF_SEARCH, RAG_EMBEDDING_DTYPE,
+    RAG_RERANK_FACTOR, RAG_HYBRID, RAG_FUSION_K, RAG_FUSION_CANDIDATES, RAG_DOMAIN_GATE
+)
+
+DEFAULT_SHARD = "default"
+
+def shard_specs(spec: str = RAG_SHARDS, shards_dir: str = RAG_SHARDS_DIR) -> list:
+    """[(name, path, weight)] from e.g. "nutrition:1.0,workouts,medical-safety:1.5"; the single default corpus if empty"""
+    if not spec.strip():
+        return [(DEFAULT_SHARD, None, 1.0)]
+
+    specs = []
+    for item in spec.split(","):
+        name, _, weight = item.strip().partition(":")
+        if name:
+            specs.append((name, os.path.join(shards_dir, name), float(weight) if weight else 1.0))
+    return specs
+
+class Shard:
+    """One named corpus with its own store, index, BM25 postings and domain gate"""
+    def __init__(self, name, path=None, weight=1.0):
+        self.name = name
+        self.path = path
+        self.weight = weight
+        # Captured before loading, so a rebuild that lands mid-load still looks changed
+        self.version = corpus_version(path)
+
+        self.similarity = SimilarityService(path)
+        corpus, embeddings = self.similarity.get_corpus()
+        self.retriever = Retriever(
+            corpus,
+            embeddings,
+            index=self.similarity.get_index(),
+            index_type=RAG_INDEX_TYPE,
+            nprobe=RAG_INDEX_NPROBE,
+            ef_search=RAG_INDEX_EF_SEARCH,
+            dtype=RAG_EMBEDDING_DTYPE,
+            rerank_factor=RAG_RERANK_FACTOR,
+            lexical=self.similarity.get_lexical() if RAG_HYBRID else None,
+            fusion_k=RAG_FUSION_K,
+            fusion_candidates=RAG_FUSION_CANDIDATES
+        )
+        self.similarity.share_embeddings(self.retriever)
+        self.domain_gate = self.similarity.get_domain_gate() if RAG_DOMAIN_GATE else None
+        print(f"Shard '{name}' ready: {len(corpus)} documents, weight={weight}")
+
+    def info(self):
+        return {
+            "name": self.name,
+            "path": self.path,
+            "weight": self.weight,
+            "documents": len(self.retriever.corpus),
+            "version": self.version,
+        }
+
+class ShardedRetriever:
+    """Retriever interface over named shards: parallel fan-out, weighted global top-k merge"""
+    def __init__(self, shards, max_workers=8):
+        self._shards = {shard.name: shard for shard in shards}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, min(max_workers, len(self._shards))), thread_name_prefix="shard-search"
+        )
+        self.threshold = shards[0].retriever.threshold
+
+    @property
+    def primary(self):
+        return next(iter(self._shards.values()))
+
+    def shards(self):
+        return list(self._shards.values())
+
+    def replace(self, shard):
+        """Swap in a rebuilt shard; readers keep the snapshot they already took"""
+        with self._lock:
+            shards = dict(self._shards)
+            shards[shard.name] = shard
+            self._shards = shards
+
+    def select(self, names=None):
+        shards = self._shards
+        if not names:
+            return list(shards.values())
+        unknown = [name for name in names if name not in shards]
+        if unknown:
+            raise HTTPException(
+                status_code=400, detail=f"Unknown shard(s) {unknown}; available: {list(shards)}"
+            )
+        return [shards[name] for name in dict.fromkeys(names)]
+
+    def estimate(self, query_embeddings, shards=None):
+        """Estimated best cosine over the selected shards per query, or None if a shard has no gate"""
+        selected = self.select(shards)
+        if any(shard.domain_gate is None for shard in selected):
+            return None
+        return np.max([shard.domain_gate.estimate(query_embeddings) for shard in selected], axis=0)
+
+    def query(self, query_embedding, top_k=3, query_text=None, shards=None):
+        query_texts = None if query_text is None else [query_text]
+        return self.query_batch(query_embedding, top_k=top_k, query_texts=query_texts, shards=shards)[0]
+
+    def query_batch(self, query_embeddings, top_k=3, query_texts=None, shards=None):
+        """Every selected shard searched concurrently; hits gain a "shard" field"""
+        selected = self.select(shards)
+        if len(selected) == 1:
+            per_shard = [selected[0].retriever.query_batch(query_embeddings, top_k=top_k, query_texts=query_texts)]
+        else:
+            futures = [
+                self._executor.submit(shard.retriever.query_batch, query_embeddings, top_k, query_texts)
+                for shard in selected
+            ]
+            per_shard = [future.result() for future in futures]
+
+        batch = []
+        for row in zip(*per_shard):
+            merged = []
+            for shard, hits in zip(selected, row):
+                for hit in hits:
+                    hit["shard"] = shard.name
+                    merged.append((shard, hit))
+            if not merged:
+                batch.append([])
+                continue
+
+            # RRF scores only reflect the rank within a shard (every shard's #1 scores the same), so hits that
+            # clear the threshold, and the best dense hit overall, merge by weighted cosine; fused scores only
+            # order the remaining slots, as in Retriever.query_batch
+            best = max(merged, key=lambda item: item[1]["score"])[1]
+
+            def rank(item):
+                shard, hit = item
+                if hit is best or hit["score"] >= shard.retriever.threshold:
+                    return (0, -shard.weight * hit["score"])
+                return (1, -shard.weight * hit.get("fused", hit["score"]))
+
+            merged.sort(key=rank)
+            batch.append([hit for _, hit in merged[:top_k]])
+        return batch
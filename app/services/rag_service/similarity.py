@@ -2,49 +2,123 @@
 import pickle
 import os
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
+from .retrieval import normalize_embeddings
+from .corpus_store import CorpusStore, DEFAULT_CORPUS_DIR, LEGACY_CORPUS_FILE
+from .embedding_cache import EmbeddingCache
+from .embedding_batcher import EmbeddingBatcher
+from .embedder import create_embedder
+from .lexical import BM25Index
+from .domain_gate import DomainGate
+from app.config import (
+    EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_DB, EMBEDDING_CACHE_DISK_SIZE, EMBEDDING_BATCH_MAX_SIZE,
+    EMBEDDING_BATCH_MAX_WAIT_MS, EMBEDDING_BACKEND, EMBEDDING_ONNX_FILE
+)
 
-# Load model once
-embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+# Load model once (torch, torch-int8 or onnx; see app/utils/benchmark_embedder.py for parity/latency)
+embedder = create_embedder(EMBEDDING_BACKEND, EMBEDDING_MODEL, onnx_file=EMBEDDING_ONNX_FILE)
+
+# Shared query embedding cache (singleton, survives service re-creation)
+_embedding_cache_instance = None
+# Shared micro-batcher for concurrent cache misses (None when EMBEDDING_BATCH_MAX_SIZE <= 1)
+_embedding_batcher_instance = None
+
+def encode_queries(queries):
+    """Run the transformer on a batch of queries, returning normalized float32 vectors"""
+    return embedder.encode(queries)
+
+def get_embedding_cache():
+    global _embedding_cache_instance
+    if _embedding_cache_instance is None:
+        _embedding_cache_instance = EmbeddingCache(
+            max_items=EMBEDDING_CACHE_SIZE,
+            db_path=EMBEDDING_CACHE_DB,
+            max_disk_items=EMBEDDING_CACHE_DISK_SIZE,
+            model_name=EMBEDDING_MODEL
+        )
+    return _embedding_cache_instance
+
+def get_embedding_batcher():
+    global _embedding_batcher_instance
+    if _embedding_batcher_instance is None and EMBEDDING_BATCH_MAX_SIZE > 1:
+        _embedding_batcher_instance = EmbeddingBatcher(
+            encode_queries,
+            max_batch=EMBEDDING_BATCH_MAX_SIZE,
+            max_wait_ms=EMBEDDING_BATCH_MAX_WAIT_MS
+        )
+    return _embedding_batcher_instance
+
+def encode_query(query):
+    """Embed one query, sharing a transformer pass with other concurrent requests when batching is on"""
+    batcher = get_embedding_batcher()
+    if batcher is None:
+        return encode_queries([query])[0]
+    return batcher.encode(query)
+
+def embed_query(query: str) -> np.ndarray:
+    """Cached query embedding; independent of any corpus, so shards and reloads share it"""
+    return get_embedding_cache().get_or_compute(query, encode_query)
+
+def embed_queries(queries) -> np.ndarray:
+    """(n, dim) matrix for a batch of queries; cache misses share one encode call"""
+    embeddings = get_embedding_cache().get_or_compute_many(list(queries), encode_queries)
+    return np.vstack(embeddings).astype("float32", copy=False)
 
 class SimilarityService:
     def __init__(self, embeddings_file=None):
+        self.store = None
+        self.index = None
+        self.lexical = None
+        self.domain_gate = None
+
         if embeddings_file is None:
-            base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-            embeddings_file = os.path.join(base_dir, "utils", "corpus", "fitness_corpus.pkl")
+            embeddings_file = DEFAULT_CORPUS_DIR if CorpusStore.exists() else LEGACY_CORPUS_FILE
         
         if not os.path.exists(embeddings_file):
             raise FileNotFoundError(f"{embeddings_file} not found. Run generate_embeddings.py first.")
 
-        with open(embeddings_file, "rb") as f:
-            data = pickle.load(f)
-
-        self.corpus = data["corpus"]
-        self.embeddings = data["embeddings"]
+        if os.path.isdir(embeddings_file):
+            # Memory-mapped store: embeddings are already normalized on disk
+            self.store = CorpusStore(embeddings_file)
+            self.corpus = self.store.corpus
+            self.embeddings = self.store.embeddings
+            self.index = self.store.load_index()
+            self.lexical = self.store.load_lexical()
+            self.domain_gate = self.store.load_domain_gate()
+            print(f"Loaded corpus store with {len(self.corpus)} documents from {embeddings_file}")
+        else:
+            # Legacy pickle (convert with: python -m app.utils.generate_embeddings --from-pickle)
+            with open(embeddings_file, "rb") as f:
+                data = pickle.load(f)
 
-    def embed_query(self, query: str) -> np.ndarray:
-        return embedder.encode([query], convert_to_numpy=True)[0]
+            self.corpus = data["corpus"]
+            # Normalized once here; the Retriever reuses this array instead of copying it
+            self.embeddings = normalize_embeddings(data["embeddings"])
 
     def get_corpus(self):
         return self.corpus, self.embeddings
-        
-    def check_domain_relevance(self, query: str, threshold: float = 0.65):
-        """Check if query is relevant to fitness/health domain using cosine similarity"""
-        query_embedding = self.embed_query(query)
-        query_embedding = query_embedding.reshape(1, -1)  # Reshape for cosine_similarity
-        
-        # Compute cosine similarity with all embeddings
-        sims = cosine_similarity(query_embedding, self.embeddings)[0]
-        
-        # Get max similarity and its index
-        max_sim = np.max(sims)
-        best_idx = np.argmax(sims)
-        
-        print(f"Domain relevance score: {max_sim:.4f}, threshold: {threshold}")
-        
-        # Check threshold
-        if max_sim >= threshold:
-            return True, best_idx, max_sim
-        else:
-            return False, None, max_sim
+
+    def share_embeddings(self, retriever):
+        """Use the Retriever's matrix so both services read one copy of the corpus vectors"""
+        self.embeddings = retriever.embeddings
+        # The matrix may be a view into the FAISS index storage; keep that index alive with it
+        self._embeddings_owner = retriever.index
+
+    def get_index(self):
+        """Prebuilt FAISS index from the corpus store, or None for the legacy pickle"""
+        return self.index
+
+    def get_lexical(self):
+        """BM25 index from the corpus store; built in memory for the legacy pickle or older stores"""
+        if self.lexical is None:
+            self.lexical = BM25Index.build(self.corpus)
+            print(f"Built BM25 index over {len(self.corpus)} documents ({len(self.lexical.terms)} terms)")
+        return self.lexical
+
+    def get_domain_gate(self):
+        """Centroid domain gate from the corpus store; built in memory for the legacy pickle or older stores"""
+        if self.domain_gate is None:
+            self.domain_gate = DomainGate.build(self.embeddings)
+            print(f"Built domain gate with {len(self.domain_gate)} centroids")
+        return self.domain_gate
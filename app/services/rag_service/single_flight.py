@@ -0,0 +1,71 @@
+# rag_service/single_flight.py
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+class _Call:
+    def __init__(self):
+        self.future = Future()
+        self.started = time.monotonic()
+
+class SingleFlight:
+    """Concurrent calls with the same key share one execution; duplicates wait on the first caller's result"""
+    def __init__(self, name, timeout=30.0):
+        self.name = name
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+
+        self.executions = 0
+        self.shared = 0
+        self.timeouts = 0
+
+    def do(self, key, fn, timeout=None):
+        """Run fn() once per in-flight key; waits at most timeout before running fn itself"""
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            call = self._calls.get(key)
+            # A call older than the timeout is presumed stuck: newcomers start fresh instead of joining it
+            if call is not None and time.monotonic() - call.started < timeout:
+                self.shared += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if leader:
+            return self._run(key, call, fn)
+
+        try:
+            return call.future.result(timeout=max(0.0, timeout - (time.monotonic() - call.started)))
+        except FutureTimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            print(f"{self.name}: shared call timed out, running it directly")
+            return fn()
+
+    def _run(self, key, call, fn):
+        try:
+            result = fn()
+        except BaseException as e:
+            call.future.set_exception(e)
+            raise
+        else:
+            call.future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                # A stale call may already have been replaced by a newer one under the same key
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._calls),
+                "executions": self.executions,
+                "shared": self.shared,
+                "timeouts": self.timeouts,
+            }
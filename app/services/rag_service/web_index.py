@@ -0,0 +1,210 @@
+# rag_service/web_index.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from .retrieval import normalize_embeddings, top_k_indices
+from .similarity import encode_queries
+from app.config import RAG_WEB_INDEX_DIR, RAG_WEB_INDEX_SIZE, RAG_WEB_INDEX_TTL, RAG_WEB_INDEX_MIN_SIMILARITY
+
+# One row per snippet with its vector, so every uvicorn worker can share the file without the
+# record and vector ever being written (or compacted) separately
+SNIPPETS_DB = "snippets.db"
+
+# Global singleton instance (independent of the corpus, so it survives RAG service re-creation)
+_web_index_instance = None
+
+class WebSnippetIndex:
+    """Vector index of vetted web snippets, searched when the knowledge base misses (shared sqlite file on disk)"""
+    def __init__(self, embed_fn, dim=384, path=None, max_items=5000, ttl_seconds=7 * 24 * 3600,
+                 min_similarity=0.4, min_chars=40):
+        self.embed_fn = embed_fn
+        self.dim = dim
+        self.path = path
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.min_similarity = min_similarity
+        self.min_chars = min_chars
+
+        self._vectors = np.zeros((0, dim), dtype="float32")
+        self._records = []   # {"id", "text", "url", "created_at", "hash"}
+        self._alive = np.zeros(0, dtype=bool)
+        self._hashes = set()
+        self._next_id = 0
+        self._last_row = 0   # highest sqlite rowid already in memory
+        self._lock = threading.Lock()
+        # Snippets are embedded off the request path
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="web-index")
+
+        self._db = None
+        if path:
+            os.makedirs(path, exist_ok=True)
+            # Other workers may hold the write lock briefly; wait for it instead of failing the add
+            self._db = sqlite3.connect(os.path.join(path, SNIPPETS_DB), timeout=30, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS snippets ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, hash TEXT UNIQUE NOT NULL, text TEXT NOT NULL, "
+                "url TEXT NOT NULL, created_at REAL NOT NULL, vector BLOB NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS snippets_created_at ON snippets(created_at)")
+            self._db.commit()
+            with self._lock:
+                self._sync()
+            print(f"Loaded web snippet index with {len(self)} snippets from {self.path}")
+
+    def __len__(self):
+        return int(self._alive.sum())
+
+    # ----- persistence -----
+
+    def _sync(self):
+        # Caller holds the lock; pull in rows added since the last sync, by this or any other worker
+        rows = self._db.execute(
+            "SELECT id, hash, text, url, created_at, vector FROM snippets WHERE id > ? ORDER BY id",
+            (self._last_row,)
+        ).fetchall()
+        if not rows:
+            return
+
+        records, vectors = [], []
+        for row_id, digest, text, url, created_at, vector in rows:
+            self._last_row = row_id
+            if len(vector) != self.dim * 4 or digest in self._hashes:
+                continue
+            records.append({"id": row_id, "text": text, "url": url, "created_at": created_at, "hash": digest})
+            vectors.append(np.frombuffer(vector, dtype="float32"))
+            self._hashes.add(digest)
+        if records:
+            self._append(records, np.vstack(vectors))
+        self._next_id = max(self._next_id, self._last_row + 1)
+        self._expire(time.time())
+
+    def _append(self, records, vectors):
+        # Caller holds the lock
+        self._vectors = np.vstack([self._vectors, vectors])
+        self._records.extend(records)
+        self._alive = np.concatenate([self._alive, np.ones(len(records), dtype=bool)])
+
+    def _compact(self):
+        # Caller holds the lock; drop evicted rows from memory (sqlite deletes them row by row)
+        keep = np.flatnonzero(self._alive)
+        self._vectors = self._vectors[keep]
+        self._records = [self._records[i] for i in keep]
+        self._alive = np.ones(len(keep), dtype=bool)
+        self._hashes = {r["hash"] for r in self._records}
+
+    # ----- eviction -----
+
+    def _expire(self, now):
+        # Caller holds the lock; TTL first, then oldest-first down to max_items
+        evicted = []
+        for i, record in enumerate(self._records):
+            if self._alive[i] and now - record["created_at"] > self.ttl_seconds:
+                self._alive[i] = False
+                evicted.append(record["id"])
+        overflow = len(self) - self.max_items
+        if overflow > 0:
+            for i in np.flatnonzero(self._alive)[:overflow]:
+                self._alive[i] = False
+                evicted.append(self._records[i]["id"])
+
+        if evicted and self._db is not None:
+            with self._db:
+                self._db.executemany("DELETE FROM snippets WHERE id = ?", [(row_id,) for row_id in evicted])
+
+        # Compact the in-memory arrays once a quarter of the rows are dead
+        dead = len(self._alive) - len(self)
+        if dead and dead * 4 >= len(self._alive):
+            self._compact()
+
+    # ----- search / add -----
+
+    def search(self, query_embedding, top_k=3, threshold=0.65):
+        """Return live snippets scoring >= threshold, best first"""
+        with self._lock:
+            if self._db is not None:
+                self._sync()
+            if not len(self):
+                return []
+            scores = self._vectors @ normalize_embeddings(query_embedding)[0]
+            scores[~self._alive] = -1.0
+            cutoff = time.time() - self.ttl_seconds
+
+            hits = []
+            for idx in top_k_indices(scores, top_k):
+                record = self._records[idx]
+                if scores[idx] >= threshold and record["created_at"] >= cutoff:
+                    hits.append({"id": record["id"], "score": float(scores[idx]), "text": record["text"], "url": record["url"]})
+            return hits
+
+    def add(self, query_embedding, snippets, urls):
+        """Vet and store web snippets for a query; returns how many were added"""
+        candidates = []
+        for text, url in zip(snippets, urls):
+            text = (text or "").strip()
+            digest = hashlib.sha1(f"{url}\0{text}".encode("utf-8")).hexdigest()
+            if len(text) >= self.min_chars and digest not in self._hashes:
+                candidates.append((text, url, digest))
+        if not candidates:
+            return 0
+
+        vectors = normalize_embeddings(self.embed_fn([text for text, _, _ in candidates]))
+        # Vetting: only keep snippets that are actually about the question that fetched them
+        relevance = vectors @ normalize_embeddings(query_embedding)[0]
+
+        with self._lock:
+            if self._db is not None:
+                # Another worker may have stored the same snippets already
+                self._sync()
+            now = time.time()
+            records, rows = [], []
+            for (text, url, digest), vector, score in zip(candidates, vectors, relevance):
+                if score < self.min_similarity or digest in self._hashes:
+                    continue
+                record = {"id": self._next_id, "text": text, "url": url, "created_at": now, "hash": digest}
+                if self._db is not None:
+                    # The rowid is the snippet id, unique across workers; a concurrent insert of the same hash is skipped
+                    with self._db:
+                        cursor = self._db.execute(
+                            "INSERT OR IGNORE INTO snippets (hash, text, url, created_at, vector) VALUES (?, ?, ?, ?, ?)",
+                            (digest, text, url, now, np.ascontiguousarray(vector, dtype="float32").tobytes())
+                        )
+                    if not cursor.rowcount:
+                        continue
+                    record["id"] = cursor.lastrowid
+                records.append(record)
+                rows.append(vector)
+                self._hashes.add(digest)
+                self._next_id = record["id"] + 1
+            if not records:
+                return 0
+
+            self._append(records, np.vstack(rows))
+            self._expire(now)
+
+        print(f"Web snippet index: added {len(records)} snippets ({len(self)} total)")
+        return len(records)
+
+    def add_async(self, query_embedding, snippets, urls):
+        """Queue snippets for vetting/embedding on the background worker"""
+        return self._executor.submit(self.add, np.array(query_embedding, dtype="float32"), list(snippets), list(urls))
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self), "rows": len(self._records), "max_items": self.max_items, "ttl_seconds": self.ttl_seconds}
+
+# Singleton getter function; None when disabled (RAG_WEB_INDEX_SIZE=0)
+def get_web_snippet_index():
+    global _web_index_instance
+    if _web_index_instance is None and RAG_WEB_INDEX_SIZE > 0:
+        _web_index_instance = WebSnippetIndex(
+            encode_queries,
+            path=RAG_WEB_INDEX_DIR or None,
+            max_items=RAG_WEB_INDEX_SIZE,
+            ttl_seconds=RAG_WEB_INDEX_TTL,
+            min_similarity=RAG_WEB_INDEX_MIN_SIMILARITY
+        )
+    return _web_index_instance
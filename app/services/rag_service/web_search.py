@@ -0,0 +1,159 @@
+# rag_service/web_search.py
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from .embedding_cache import normalize_query
+from app.config import (
+    RAG_WEB_SEARCH_PROVIDER, RAG_WEB_SEARCH_TIMEOUT, RAG_WEB_SEARCH_CACHE_TTL, RAG_WEB_SEARCH_CACHE_SIZE
+)
+
+# Global singleton instance
+_web_search_instance = None
+
+class DDGSSearchProvider:
+    """DuckDuckGo text search"""
+    name = "ddgs"
+
+    def __init__(self, timeout=5):
+        from ddgs import DDGS
+        self._ddgs_class = DDGS
+        self.timeout = timeout
+
+    def search(self, query, max_results=3):
+        with self._ddgs_class(timeout=self.timeout) as ddgs:
+            return [
+                {"body": r["body"], "href": r["href"], "title": r.get("title", "")}
+                for r in ddgs.text(query, max_results=max_results)
+            ]
+
+class StubSearchProvider:
+    """Offline provider with canned results (tests and load benchmarks)"""
+    name = "stub"
+
+    def __init__(self, results=None, delay=0.0):
+        self.results = results
+        self.delay = delay
+        self.calls = 0
+
+    def search(self, query, max_results=3):
+        self.calls += 1
+        if self.delay:
+            time.sleep(self.delay)
+        if self.results is not None:
+            return self.results[:max_results]
+        return [
+            {"body": f"Stub result {i + 1} for: {query}", "href": f"https://example.com/stub/{i + 1}", "title": "Stub"}
+            for i in range(max_results)
+        ]
+
+class WebSearchService:
+    """Runs searches on a worker pool with a hard deadline, a TTL cache and in-flight coalescing"""
+    def __init__(self, provider, timeout=3.0, cache_ttl=1800, cache_size=512, max_workers=4):
+        self.provider = provider
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="web-search")
+        self._cache = OrderedDict()  # key -> (expires_at, results)
+        self._inflight = {}          # key -> Future shared by concurrent identical searches
+        self._lock = threading.Lock()
+
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.searches = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def _run(self, key, query, max_results):
+        try:
+            results = self.provider.search(query, max_results=max_results)
+        except Exception as e:
+            print(f"Web search error: {e}")
+            with self._lock:
+                self.errors += 1
+            results = None
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            # Late results still land in the cache, so the next identical query is instant
+            if results:
+                self._cache[key] = (time.time() + self.cache_ttl, results)
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return results or []
+
+    def submit(self, query, max_results=3):
+        """Return a Future for the search results (cached, joined in-flight, or newly started)"""
+        key = (normalize_query(query), max_results)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                if cached[0] > time.time():
+                    self._cache.move_to_end(key)
+                    self.cache_hits += 1
+                    return _completed_future(cached[1])
+                del self._cache[key]
+
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+
+            self.searches += 1
+            future = self._executor.submit(self._run, key, query, max_results)
+            self._inflight[key] = future
+            return future
+
+    def search(self, query, max_results=3, timeout=None):
+        """Blocking search bounded by the deadline; returns [] on timeout or error"""
+        timeout = self.timeout if timeout is None else timeout
+        future = self.submit(query, max_results)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            print(f"Web search timed out after {timeout}s: '{query}'")
+            return []
+
+    def stats(self):
+        with self._lock:
+            return {
+                "provider": self.provider.name,
+                "cache_size": len(self._cache),
+                "cache_hits": self.cache_hits,
+                "coalesced": self.coalesced,
+                "searches": self.searches,
+                "inflight": len(self._inflight),
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+            }
+
+def _completed_future(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+def create_provider(name):
+    if name == "ddgs":
+        return DDGSSearchProvider()
+    if name == "stub":
+        return StubSearchProvider()
+    if name == "none":
+        return StubSearchProvider(results=[])
+    raise ValueError(f"Unknown web search provider '{name}'")
+
+# Singleton getter function
+def get_web_search_service():
+    global _web_search_instance
+    if _web_search_instance is None:
+        _web_search_instance = WebSearchService(
+            create_provider(RAG_WEB_SEARCH_PROVIDER),
+            timeout=RAG_WEB_SEARCH_TIMEOUT,
+            cache_ttl=RAG_WEB_SEARCH_CACHE_TTL,
+            cache_size=RAG_WEB_SEARCH_CACHE_SIZE
+        )
+    return _web_search_instance
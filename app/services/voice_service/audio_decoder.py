@@ -0,0 +1,157 @@
+import io
+import os
+import queue
+import subprocess
+import tempfile
+import threading
+from math import gcd
+import numpy as np
+import soundfile as sf
+from scipy.signal import resample_poly
+from fastapi import HTTPException
+from app.config import VOICE_DECODER_POOL_SIZE, VOICE_DECODE_TIMEOUT
+
+# Whisper's input format: 16 kHz mono float32 in [-1, 1]
+SAMPLE_RATE = 16000
+
+# Containers libsndfile reads directly; everything else (webm, m4a) goes through ffmpeg
+SOUNDFILE_EXTENSIONS = {".wav", ".flac", ".ogg", ".mp3"}
+
+# Same conversion whisper.audio.load_audio runs, but reading stdin instead of a file path
+FFMPEG_COMMAND = [
+    "ffmpeg", "-nostdin", "-loglevel", "error", "-threads", "0", "-i", "pipe:0",
+    "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "pipe:1"
+]
+
+# Global instance (singleton)
+_audio_decoder_instance = None
+_audio_decoder_lock = threading.Lock()
+
+def to_whisper_input(samples, rate):
+    """Downmix to mono and resample to 16 kHz float32"""
+    samples = np.asarray(samples, dtype="float32")
+    if samples.ndim == 2:
+        samples = samples.mean(axis=1)
+    if rate != SAMPLE_RATE:
+        # Polyphase filter: exact rational ratio (e.g. 48k -> 16k is 1/3) with built-in anti-aliasing
+        divisor = gcd(SAMPLE_RATE, int(rate))
+        samples = resample_poly(samples, SAMPLE_RATE // divisor, int(rate) // divisor).astype("float32")
+    return np.ascontiguousarray(samples)
+
+class AudioDecoder:
+    """Decodes uploads in memory: libsndfile for PCM-style formats, a warm ffmpeg pool for the rest"""
+    def __init__(self, pool_size=VOICE_DECODER_POOL_SIZE, timeout=VOICE_DECODE_TIMEOUT):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._idle = queue.Queue()
+        self._closed = False
+
+        try:
+            for _ in range(pool_size):
+                self._idle.put(self._spawn())
+            self.ffmpeg_available = True
+            print(f"Audio decoder ready: {pool_size} warm ffmpeg processes")
+        except FileNotFoundError:
+            self.ffmpeg_available = False
+            print("Audio decoder: ffmpeg not found, only WAV/FLAC/OGG/MP3 uploads can be decoded")
+
+    def decode(self, content: bytes, ext: str) -> np.ndarray:
+        """Audio bytes -> 16 kHz mono float32 array for Whisper"""
+        if ext in SOUNDFILE_EXTENSIONS:
+            try:
+                samples, rate = sf.read(io.BytesIO(content), dtype="float32", always_2d=True)
+                return to_whisper_input(samples, rate)
+            except RuntimeError as e:
+                # e.g. Opus-in-Ogg on an older libsndfile: let ffmpeg try
+                print(f"soundfile could not decode {ext} upload ({e}), using ffmpeg")
+        return self._decode_ffmpeg(content, ext)
+
+    def _spawn(self):
+        return subprocess.Popen(FFMPEG_COMMAND, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def _acquire(self):
+        """A pre-spawned ffmpeg waiting on stdin; a replacement is started in the background"""
+        process = None
+        while process is None:
+            try:
+                process = self._idle.get_nowait()
+            except queue.Empty:
+                return self._spawn()
+            if process.poll() is not None:
+                process = None
+        threading.Thread(target=self._refill, name="ffmpeg-refill", daemon=True).start()
+        return process
+
+    def _refill(self):
+        if self._closed or self._idle.qsize() >= self.pool_size:
+            return
+        try:
+            self._idle.put(self._spawn())
+        except OSError as e:
+            print(f"Audio decoder: could not start ffmpeg ({e})")
+
+    def _decode_ffmpeg(self, content, ext):
+        if not self.ffmpeg_available:
+            raise HTTPException(status_code=500, detail=f"FFmpeg is required to decode {ext} audio")
+
+        process = self._acquire()
+        try:
+            pcm, stderr = process.communicate(input=content, timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise HTTPException(status_code=500, detail="Audio decoding timed out")
+
+        if process.returncode != 0 or not pcm:
+            # MP4/M4A with the index at the end can't be demuxed from a pipe; ffmpeg needs to seek
+            if ext in (".m4a", ".mp4"):
+                return self._decode_ffmpeg_file(content, ext)
+            raise HTTPException(status_code=400, detail=f"Could not decode audio: {stderr.decode(errors='ignore').strip()}")
+        return np.frombuffer(pcm, np.int16).astype("float32") / 32768.0
+
+    def _decode_ffmpeg_file(self, content, ext):
+        """Seekable fallback for containers that can't be streamed"""
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
+                tmp.write(content)
+                tmp_path = tmp.name
+            command = [tmp_path if arg == "pipe:0" else arg for arg in FFMPEG_COMMAND]
+            result = subprocess.run(command, capture_output=True, timeout=self.timeout)
+            if result.returncode != 0 or not result.stdout:
+                raise HTTPException(
+                    status_code=400, detail=f"Could not decode audio: {result.stderr.decode(errors='ignore').strip()}"
+                )
+            return np.frombuffer(result.stdout, np.int16).astype("float32") / 32768.0
+        finally:
+            if tmp_path and os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                process = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            process.kill()
+            process.communicate()
+
+# Singleton getter function
+def get_audio_decoder():
+    global _audio_decoder_instance
+    if _audio_decoder_instance is None:
+        with _audio_decoder_lock:
+            if _audio_decoder_instance is None:
+                _audio_decoder_instance = AudioDecoder()
+    return _audio_decoder_instance
+
+def decode_audio(content: bytes, ext: str) -> np.ndarray:
+    return get_audio_decoder().decode(content, ext)
+
+def close_audio_decoder():
+    global _audio_decoder_instance
+    with _audio_decoder_lock:
+        if _audio_decoder_instance is not None:
+            _audio_decoder_instance.close()
+            _audio_decoder_instance = None
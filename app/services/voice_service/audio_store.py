@@ -0,0 +1,81 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from app.config import VOICE_AUDIO_STORE_TTL, VOICE_AUDIO_STORE_MAX_BYTES
+
+# Global instance (singleton)
+_audio_store_instance = None
+_audio_store_lock = threading.Lock()
+
+class AudioStore:
+    """Short-lived in-memory store behind the audio URLs handed out by /assistant"""
+    def __init__(self, ttl=VOICE_AUDIO_STORE_TTL, max_bytes=VOICE_AUDIO_STORE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()  # id -> (audio, content_type, expires_at), oldest first
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.stored = 0
+        self.served = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def put(self, audio, content_type) -> str:
+        # Unguessable id: the URL is the only credential for the audio
+        audio_id = secrets.token_urlsafe(16)
+        with self._lock:
+            self._purge()
+            self._items[audio_id] = (audio, content_type, time.time() + self.ttl)
+            self._bytes += len(audio)
+            self.stored += 1
+            while self._bytes > self.max_bytes and len(self._items) > 1:
+                _, (evicted, _, _) = self._items.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+        return audio_id
+
+    def get(self, audio_id):
+        """(audio, content_type), or None once expired or evicted"""
+        with self._lock:
+            self._purge()
+            item = self._items.get(audio_id)
+            if item is None:
+                return None
+            self.served += 1
+            return item[0], item[1]
+
+    def _purge(self):
+        # Caller holds the lock; same TTL for every entry, so expired ones are at the front
+        now = time.time()
+        while self._items:
+            audio_id, (audio, _, expires_at) = next(iter(self._items.items()))
+            if expires_at > now:
+                break
+            del self._items[audio_id]
+            self._bytes -= len(audio)
+            self.expired += 1
+
+    def stats(self):
+        with self._lock:
+            self._purge()
+            return {
+                "items": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "stored": self.stored,
+                "served": self.served,
+                "expired": self.expired,
+                "evictions": self.evictions,
+            }
+
+# Singleton getter function
+def get_audio_store():
+    global _audio_store_instance
+    if _audio_store_instance is None:
+        with _audio_store_lock:
+            if _audio_store_instance is None:
+                _audio_store_instance = AudioStore()
+    return _audio_store_instance
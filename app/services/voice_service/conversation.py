@@ -1,9 +1,58 @@
 from .diet_questions import get_diet_questions
 from .fitness_questions import get_fitness_questions
+import asyncio
 import re
+import weakref
 
 # Store conversation state for each plan type
 user_conversations = {}
+# One asyncio lock per user_id while any turn holds or waits on it (entries drop out once unused)
+_conversation_locks = weakref.WeakValueDictionary()
+
+# Spoken side answers follow the same 50-word budget as the RAG prompt
+VOICE_ANSWER_MAX_WORDS = 50
+
+# Scripted replies, per plan type (fixed text, so their speech can be pre-rendered)
+GREETING_REPLIES = {
+    "fitness": "Hi! I'm your fitness assistant. I'll help recommend a personalized workout plan for you. May I ask you a few quick questions to get started?",
+    "diet": "Hi! I'm your nutrition assistant. I'll help recommend a personalized diet plan for you. May I ask you a few quick questions to get started?",
+}
+GREETING_PROMPTS = {
+    "fitness": "Hello! I'm your fitness assistant. Say 'hi' or 'hello' to get started with your personalized workout plan!",
+    "diet": "Hello! I'm your nutrition assistant. Say 'hi' or 'hello' to get started with your personalized diet plan!",
+}
+CONFIRMATION_PROMPTS = {
+    "fitness": "Great! Just say 'yes' or 'sure' when you're ready to start answering questions for your fitness plan.",
+    "diet": "Great! Just say 'yes' or 'sure' when you're ready to start answering questions for your diet plan.",
+}
+PLAN_READY_REPLIES = {
+    "fitness": "Thanks! I have all the information I need. Your personalized fitness plan is now being generated. PLease visit dashboard to view it.",
+    "diet": "Thanks! I have all the information I need. Your personalized diet plan is now being generated. Please visit dashboard to view it.",
+}
+RAG_NO_ANSWER_REPLY = "I don't have specific information about that in my knowledge base. Let's continue with the questions so I can help you with your personalized plan."
+RAG_ERROR_REPLY = "I'm having trouble accessing my knowledge base right now. Let's continue with the questions to create your personalized plan."
+FALLBACK_REPLY = "I'm sorry, something went wrong. Please say 'hi' to start over."
+
+def get_questions(plan_type="diet"):
+    return get_fitness_questions() if plan_type == "fitness" else get_diet_questions()
+
+def scripted_prompts():
+    """Every fixed reply the voice flow can speak (greetings, questions, confirmations)"""
+    prompts = []
+    for plan_type in ("diet", "fitness"):
+        prompts += [GREETING_REPLIES[plan_type], GREETING_PROMPTS[plan_type], CONFIRMATION_PROMPTS[plan_type]]
+        prompts += get_questions(plan_type)
+        prompts.append(PLAN_READY_REPLIES[plan_type])
+    prompts += [RAG_NO_ANSWER_REPLY, RAG_ERROR_REPLY, FALLBACK_REPLY]
+    return list(dict.fromkeys(prompts))
+
+def conversation_lock(user_id):
+    """Per-user lock: hold it around get_next_prompt so one user's turns never interleave on the I/O pool"""
+    # Only touched from the event loop, so the dict itself needs no lock
+    lock = _conversation_locks.get(user_id)
+    if lock is None:
+        lock = _conversation_locks[user_id] = asyncio.Lock()
+    return lock
 
 def get_user_state(user_id, plan_type="diet"):
     """Get or create user conversation state"""
@@ -12,12 +61,8 @@ def get_user_state(user_id, plan_type="diet"):
     key = f"{user_id}_{plan_type}"
     if key not in user_conversations:
         # Get the correct questions based on plan type
-        if plan_type == "fitness":
-            questions = get_fitness_questions()
-            print(f"Loading FITNESS questions: {len(questions)} total")
-        else:
-            questions = get_diet_questions()
-            print(f"Loading DIET questions: {len(questions)} total")
+        questions = get_questions(plan_type)
+        print(f"Loading {'FITNESS' if plan_type == 'fitness' else 'DIET'} questions: {len(questions)} total")
             
         user_conversations[key] = {
             "current_index": -1,  # Start at -1 to handle greeting first
@@ -261,20 +306,22 @@ def answer_side_question_with_rag(user_question):
         # Get RAG service instance
         rag_service = get_rag_service()
         
-        # Query the RAG service
-        result = rag_service.hybrid_rag_answer(query=user_question, top_k=3)
+        # Query the RAG service; near-exact knowledge-base matches skip the LLM (trimmed to the voice budget)
+        result = rag_service.hybrid_rag_answer(
+            query=user_question, top_k=3, max_words=VOICE_ANSWER_MAX_WORDS, direct_answer=True
+        )
         
         if result["source"] == "none":
             # If RAG doesn't have an answer, provide a helpful response
             print("❌ RAG couldn't find relevant information")
-            return "I don't have specific information about that in my knowledge base. Let's continue with the questions so I can help you with your personalized plan."
+            return RAG_NO_ANSWER_REPLY
         else:
             print(f"✅ RAG found answer from source: {result['source']}")
             return result["answer"]
             
     except Exception as e:
         print(f"❌ Error using RAG service: {str(e)}")
-        return "I'm having trouble accessing my knowledge base right now. Let's continue with the questions to create your personalized plan."
+        return RAG_ERROR_REPLY
 
 def get_next_prompt(user_text, user_id, plan_type="diet", llm_answer_func=None):
     """Get next question or generate plan when complete"""
@@ -295,16 +342,10 @@ def get_next_prompt(user_text, user_id, plan_type="diet", llm_answer_func=None):
         
         if any(word in user_lower for word in greeting_words):
             state["greeted"] = True
-            if plan_type == "fitness":
-                return "Hi! I'm your fitness assistant. I'll help recommend a personalized workout plan for you. May I ask you a few quick questions to get started?"
-            else:  # diet
-                return "Hi! I'm your nutrition assistant. I'll help recommend a personalized diet plan for you. May I ask you a few quick questions to get started?"
+            return GREETING_REPLIES["fitness" if plan_type == "fitness" else "diet"]
         else:
             # If they don't greet properly, prompt them
-            if plan_type == "fitness":
-                return "Hello! I'm your fitness assistant. Say 'hi' or 'hello' to get started with your personalized workout plan!"
-            else:
-                return "Hello! I'm your nutrition assistant. Say 'hi' or 'hello' to get started with your personalized diet plan!"
+            return GREETING_PROMPTS["fitness" if plan_type == "fitness" else "diet"]
     
     # Handle user confirmation after greeting
     if state["current_index"] == -1 and state.get("greeted", False):
@@ -320,10 +361,7 @@ def get_next_prompt(user_text, user_id, plan_type="diet", llm_answer_func=None):
             return current_question
         else:
             # User didn't confirm, ask again
-            if plan_type == "fitness":
-                return "Great! Just say 'yes' or 'sure' when you're ready to start answering questions for your fitness plan."
-            else:
-                return "Great! Just say 'yes' or 'sure' when you're ready to start answering questions for your diet plan."
+            return CONFIRMATION_PROMPTS["fitness" if plan_type == "fitness" else "diet"]
     
     # Normal question flow
     if state["current_index"] >= 0:
@@ -404,14 +442,14 @@ def get_next_prompt(user_text, user_id, plan_type="diet", llm_answer_func=None):
         if plan_type == "fitness":
             plan = generate_fitness_plan(user_answers)
             plan_text = format_plan_response(plan, "fitness")
-            return f"Thanks! I have all the information I need. Your personalized fitness plan is now being generated. PLease visit dashboard to view it."
+            return PLAN_READY_REPLIES["fitness"]
         else:
             plan = generate_diet_plan(user_answers)
             plan_text = format_plan_response(plan, "diet")
-            return f"Thanks! I have all the information I need. Your personalized diet plan is now being generated. Please visit dashboard to view it."
+            return PLAN_READY_REPLIES["diet"]
 
     # Fallback - shouldn't reach here
-    return "I'm sorry, something went wrong. Please say 'hi' to start over."
+    return FALLBACK_REPLY
 
 def reset_conversation(user_id, plan_type="diet"):
     """Reset conversation state"""
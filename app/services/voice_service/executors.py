@@ -0,0 +1,46 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.config import VOICE_STT_WORKERS, VOICE_IO_WORKERS
+
+# Global instances (singletons)
+_stt_executor_instance = None
+_io_executor_instance = None
+_executor_lock = threading.Lock()
+
+def get_stt_executor():
+    """CPU pool for Whisper; kept small because each decode already uses several torch threads"""
+    global _stt_executor_instance
+    if _stt_executor_instance is None:
+        with _executor_lock:
+            if _stt_executor_instance is None:
+                _stt_executor_instance = ThreadPoolExecutor(max_workers=VOICE_STT_WORKERS, thread_name_prefix="voice-stt")
+    return _stt_executor_instance
+
+def get_io_executor():
+    """I/O pool for Gemini text and TTS calls, which mostly wait on the network"""
+    global _io_executor_instance
+    if _io_executor_instance is None:
+        with _executor_lock:
+            if _io_executor_instance is None:
+                _io_executor_instance = ThreadPoolExecutor(max_workers=VOICE_IO_WORKERS, thread_name_prefix="voice-io")
+    return _io_executor_instance
+
+async def run_stt(fn, *args, **kwargs):
+    """Run a speech-to-text call on the STT pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_stt_executor(), functools.partial(fn, *args, **kwargs))
+
+async def run_io(fn, *args, **kwargs):
+    """Run a blocking LLM/TTS call on the I/O pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_io_executor(), functools.partial(fn, *args, **kwargs))
+
+def shutdown_executors():
+    global _stt_executor_instance, _io_executor_instance
+    with _executor_lock:
+        for executor in (_stt_executor_instance, _io_executor_instance):
+            if executor is not None:
+                executor.shutdown(wait=False)
+        _stt_executor_instance = _io_executor_instance = None
@@ -17,19 +17,21 @@ class SpeechToTextService:
     def is_available(self):
         return self.model is not None
         
-    def transcribe(self, audio_path):
-        """Transcribe audio file to text"""
+    def transcribe(self, audio):
+        """Transcribe audio to text (a file path, or a 16 kHz mono float32 array from the audio decoder)"""
         if not self.is_available():
             raise HTTPException(status_code=500, detail="Speech-to-text service not available")
             
         try:
-            result = self.model.transcribe(audio_path, fp16=False)
+            result = self.model.transcribe(audio, fp16=False)
             user_text = result.get("text", "").strip()
             
             if not user_text:
                 raise HTTPException(status_code=400, detail="Could not transcribe audio")
                 
             return user_text
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Speech-to-text error: {str(e)}")
 
@@ -1,20 +1,29 @@
 from google.genai import types
 from gtts import gTTS
-import tempfile
-import os
-from app.utils.audio import wave_file
-from app.config import GEMINI_TTS_MODEL, GEMINI_TTS_VOICE
+import io
+import time
+from app.utils.audio import wav_bytes
+from app.config import GEMINI_TTS_MODEL, GEMINI_TTS_VOICE, VOICE_TTS_CACHE_MAX_BYTES, VOICE_TTS_CACHE_DIR
 from app.services.voice_service.llm import get_language_model_service
+from app.services.voice_service.tts_cache import TTSCache
 
 # Global singleton instance
 _tts_service_instance = None
 
 class TextToSpeechService:
-    def __init__(self, client):
+    def __init__(self, client, cache=None):
         self.client = client
+        self.cache = cache
         
     def generate_speech(self, text):
         """Generate speech audio from text, with fallback to gTTS"""
+        # Scripted prompts (and any reply spoken before) are served from the cache
+        if self.cache is not None:
+            cached = self.cache.get(text, GEMINI_TTS_VOICE, GEMINI_TTS_MODEL, ".wav")
+            if cached is not None:
+                print(f"TTS cache hit ({len(cached)} bytes)")
+                return cached, ".wav"
+
         try:
             # First try Gemini TTS
             print("Generating speech with Gemini TTS...")
@@ -22,14 +31,31 @@ class TextToSpeechService:
             
             if audio_content and isinstance(audio_content, bytes) and len(audio_content) > 0:
                 print(f"Gemini TTS audio generated successfully ({len(audio_content)} bytes)")
+                if self.cache is not None:
+                    self.cache.put(text, GEMINI_TTS_VOICE, GEMINI_TTS_MODEL, ".wav", audio_content)
                 return audio_content, ".wav"
             else:
                 raise Exception(f"Gemini TTS returned invalid audio: {type(audio_content)}")
                 
         except Exception as e:
-            # Fallback to gTTS
+            # Fallback to gTTS (not cached, so the Gemini voice returns once Gemini recovers)
             print(f"Falling back to gTTS: {e}")
             return self._gtts_fallback(text), ".mp3"
+
+    def prerender(self, texts):
+        """Render every text missing from the cache with Gemini TTS; returns counts"""
+        rendered = skipped = failed = 0
+        for text in texts:
+            if self.cache.contains(text, GEMINI_TTS_VOICE, GEMINI_TTS_MODEL, ".wav"):
+                skipped += 1
+                continue
+            try:
+                self.cache.put(text, GEMINI_TTS_VOICE, GEMINI_TTS_MODEL, ".wav", self._gemini_tts(text), persist=True)
+                rendered += 1
+            except Exception as e:
+                print(f"Pre-render failed for '{text[:40]}...': {e}")
+                failed += 1
+        return {"rendered": rendered, "skipped": skipped, "failed": failed}
             
     def _gemini_tts(self, text):
         """Generate TTS using Gemini's TTS capabilities"""
@@ -61,40 +87,18 @@ class TextToSpeechService:
         # Extract audio data
         audio_data = response.candidates[0].content.parts[0].inline_data.data
         
-        # Convert to WAV
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_wav:
-            wave_file(temp_wav.name, audio_data)
-            temp_wav_path = temp_wav.name
-        
-        # Read back as bytes
-        with open(temp_wav_path, 'rb') as f:
-            audio_bytes = f.read()
-            
-        # Clean up temp file
-        try:
-            os.unlink(temp_wav_path)
-        except:
-            pass
-            
-        return audio_bytes
+        # Wrap the 24 kHz 16-bit PCM in a WAV header, in memory
+        return wav_bytes(audio_data)
         
     def _gtts_fallback(self, text):
         """Fallback to gTTS for speech generation"""
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as audio_out:
-                tmp_output_path = audio_out.name
-                tts = gTTS(text, lang="en")
-                tts.save(tmp_output_path)
+            # gTTS streams the MP3 chunks straight into the buffer
+            buffer = io.BytesIO()
+            gTTS(text, lang="en").write_to_fp(buffer)
 
-            # Read the file as bytes
-            with open(tmp_output_path, "rb") as f:
-                audio_bytes = f.read()
-                
-            # Clean up
-            os.unlink(tmp_output_path)
-            
             print("Fallback gTTS audio generated successfully")
-            return audio_bytes
+            return buffer.getvalue()
             
         except Exception as e:
             print(f"gTTS also failed: {e}")
@@ -106,5 +110,14 @@ def get_tts_service():
     if _tts_service_instance is None:
         # Get the LLM service to use its client
         llm_service = get_language_model_service()
-        _tts_service_instance = TextToSpeechService(llm_service.client)
-    return _tts_service_instance
\ No newline at end of file
+        cache = TTSCache(max_bytes=VOICE_TTS_CACHE_MAX_BYTES, directory=VOICE_TTS_CACHE_DIR or None)
+        _tts_service_instance = TextToSpeechService(llm_service.client, cache=cache)
+    return _tts_service_instance
+
+def prerender_scripted_prompts():
+    """Render the greeting, question and confirmation speech ahead of the first voice turn"""
+    from app.services.voice_service.conversation import scripted_prompts
+    started = time.time()
+    result = get_tts_service().prerender(scripted_prompts())
+    print(f"TTS pre-render done in {time.time() - started:.1f}s: {result}")
+    return result
\ No newline at end of file
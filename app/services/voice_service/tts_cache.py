@@ -0,0 +1,127 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+class TTSCache:
+    """Content-addressed TTS audio cache: a bounded in-memory LRU tier, plus an optional on-disk tier
+    that only holds persisted entries (the pre-rendered scripted prompts, a fixed set)"""
+    def __init__(self, max_bytes=64 * 1024 * 1024, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(text, voice, model, suffix):
+        # Everything that changes the rendered audio is part of the key
+        raw = f"{model}\0{voice}\0{suffix}\0{text.strip()}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def _remember(self, key, audio):
+        # Caller holds the lock
+        if key in self._items:
+            self._bytes -= len(self._items[key])
+        self._items[key] = audio
+        self._items.move_to_end(key)
+        self._bytes += len(audio)
+        while self._bytes > self.max_bytes and len(self._items) > 1:
+            _, evicted = self._items.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def get(self, text, voice, model, suffix):
+        key = self.key(text, voice, model, suffix)
+        with self._lock:
+            audio = self._items.get(key)
+            if audio is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return audio
+
+        if self.directory:
+            try:
+                with open(self._path(key, suffix), "rb") as f:
+                    audio = f.read()
+            except FileNotFoundError:
+                audio = None
+            if audio:
+                with self._lock:
+                    self._remember(key, audio)
+                    self.disk_hits += 1
+                return audio
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, text, voice, model, suffix, audio, persist=False):
+        """Cache audio in memory; persist=True also writes it to the disk tier"""
+        key = self.key(text, voice, model, suffix)
+        with self._lock:
+            self._remember(key, audio)
+            self.stores += 1
+
+        # Free-form replies (LLM and RAG answers, validation messages) stay memory-only,
+        # so the uncapped disk tier never grows beyond the scripted prompts
+        if persist and self.directory:
+            # Write then rename, so a reader never sees a half-written file
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(audio)
+                os.replace(tmp_path, self._path(key, suffix))
+            except OSError as e:
+                print(f"TTS cache: could not write {key}{suffix}: {e}")
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+        return audio
+
+    def contains(self, text, voice, model, suffix):
+        key = self.key(text, voice, model, suffix)
+        with self._lock:
+            if key in self._items:
+                return True
+        return bool(self.directory) and os.path.exists(self._path(key, suffix))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            stats = {
+                "memory_items": len(self._items),
+                "memory_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+        if self.directory:
+            stats["disk_items"] = sum(1 for name in os.listdir(self.directory) if not name.endswith(".tmp"))
+        return stats
+
+    def clear(self):
+        with self._lock:
+            removed = len(self._items)
+            self._items.clear()
+            self._bytes = 0
+        if self.directory:
+            for name in os.listdir(self.directory):
+                os.unlink(os.path.join(self.directory, name))
+        return removed
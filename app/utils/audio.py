@@ -1,8 +1,13 @@
 import wave
-import tempfile
-import os
+import struct
 import base64
 
+# Response content types for the suffixes TextToSpeechService returns
+AUDIO_CONTENT_TYPES = {".wav": "audio/wav", ".mp3": "audio/mpeg"}
+
+# RIFF/WAVE header for uncompressed PCM: RIFF chunk, 16-byte fmt chunk, data chunk header
+_WAV_HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")
+
 def wave_file(filename, pcm, channels=1, rate=24000, sample_width=2):
     """Create a WAV file from PCM data"""
     with wave.open(filename, "wb") as wf:
@@ -11,22 +16,20 @@ def wave_file(filename, pcm, channels=1, rate=24000, sample_width=2):
         wf.setframerate(rate)
         wf.writeframes(pcm)
 
+def wav_bytes(pcm, channels=1, rate=24000, sample_width=2):
+    """WAV bytes from PCM data, built in memory (same output as wave_file)"""
+    block_align = channels * sample_width
+    header = _WAV_HEADER.pack(
+        b"RIFF", 36 + len(pcm), b"WAVE",
+        b"fmt ", 16, 1, channels, rate, rate * block_align, block_align, sample_width * 8,
+        b"data", len(pcm)
+    )
+    # Single copy of the PCM: header and samples joined straight into the result
+    return b"".join((header, memoryview(pcm)))
+
 def audio_to_base64(audio_content, suffix=".wav"):
     """Convert audio bytes to base64 string"""
     if not audio_content:
         return None
-        
-    tmp_path = None
-    try:
-        # Save to temp file first to verify it's valid audio
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as audio_out:
-            tmp_path = audio_out.name
-            audio_out.write(audio_content)
-        
-        # Read back and encode to base64
-        with open(tmp_path, "rb") as f:
-            return base64.b64encode(f.read()).decode("utf-8")
-    finally:
-        # Clean up temp file
-        if tmp_path and os.path.exists(tmp_path):
-            os.unlink(tmp_path)
\ No newline at end of file
+    # Base64 output is pure ASCII, so decoding can skip UTF-8 validation
+    return base64.b64encode(audio_content).decode("ascii")
@@ -0,0 +1,68 @@
+# benchmark_audio.py
+# Per-turn cost of turning Gemini TTS PCM into the base64 WAV the /assistant response carries.
+#
+# Usage:
+#   python -m app.utils.benchmark_audio                  # 2, 5, 10 and 30 second replies
+#   python -m app.utils.benchmark_audio --seconds 8 --runs 500
+#
+# "temp files" is the former path: wave.open on a NamedTemporaryFile, read it back, then write
+# the bytes to a second temp file and read them again before base64. "in memory" builds the
+# header with struct, joins it to the PCM once and base64-encodes the result directly.
+# Peak memory is tracemalloc's peak per turn, which counts every intermediate copy.
+import argparse
+import base64
+import os
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+from app.utils.audio import wave_file, wav_bytes, audio_to_base64
+
+def temp_file_turn(pcm):
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_wav:
+        wave_file(temp_wav.name, pcm)
+        temp_wav_path = temp_wav.name
+    with open(temp_wav_path, "rb") as f:
+        audio = f.read()
+    os.unlink(temp_wav_path)
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as audio_out:
+        tmp_path = audio_out.name
+        audio_out.write(audio)
+    with open(tmp_path, "rb") as f:
+        encoded = base64.b64encode(f.read()).decode("utf-8")
+    os.unlink(tmp_path)
+    return encoded
+
+def in_memory_turn(pcm):
+    return audio_to_base64(wav_bytes(pcm))
+
+def measure(fn, pcm, runs):
+    fn(pcm)
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn(pcm)
+    latency = (time.perf_counter() - start) / runs
+
+    tracemalloc.start()
+    fn(pcm)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return latency, peak
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark TTS audio encoding: temp files vs in memory")
+    parser.add_argument("--seconds", type=float, action="append", help="reply length (repeatable)")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--rate", type=int, default=24000, help="Gemini TTS PCM sample rate")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for seconds in args.seconds or [2, 5, 10, 30]:
+        pcm = rng.integers(-32768, 32767, size=int(seconds * args.rate), dtype=np.int16).tobytes()
+        assert temp_file_turn(pcm) == in_memory_turn(pcm), "in-memory WAV differs from wave module output"
+
+        print(f"{seconds:5.1f} s reply ({len(pcm) / 1024:,.0f} KiB PCM)")
+        for name, fn in (("temp files", temp_file_turn), ("in memory", in_memory_turn)):
+            latency, peak = measure(fn, pcm, args.runs)
+            print(f"  {name:<11} {latency * 1e3:8.3f} ms/turn   peak {peak / 1024:8,.0f} KiB")
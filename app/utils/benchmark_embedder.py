@@ -0,0 +1,101 @@
+# benchmark_embedder.py
+# Parity and latency comparison of the query embedder backends.
+#
+# Usage:
+#   python -m app.utils.benchmark_embedder                          # torch, torch-int8, onnx
+#   python -m app.utils.benchmark_embedder --backends torch onnx --onnx-file onnx/model_qint8_avx512_vnni.onnx
+#
+# Parity is the cosine between each backend's embedding and the torch reference for the
+# same text (the corpus vectors are built with the reference, so the serving backend must
+# agree closely). Latency is measured at batch size 1, like a cache miss on the serving path,
+# plus batched throughput. Exits non-zero if any backend falls below --min-cosine.
+import argparse
+import sys
+import time
+import numpy as np
+from app.services.rag_service.corpus_store import CorpusStore, DEFAULT_CORPUS_DIR
+from app.services.rag_service.embedder import EMBEDDER_BACKENDS, create_embedder, check_parity
+from app.utils.corpus_builder import MODEL_NAME
+
+SAMPLE_QUERIES = [
+    "How much protein should I eat to build muscle?",
+    "Is it okay to do cardio every day?",
+    "What should I eat before a morning workout?",
+    "How many rest days do I need per week?",
+    "Best exercises for lower back pain",
+    "How do I lose belly fat?",
+    "Are carbs bad for weight loss?",
+    "How long should I hold a plank?",
+    "What is a good resting heart rate?",
+    "How much water should I drink when exercising?",
+]
+
+def sample_texts(count):
+    """Questions from the corpus store when built, else the canned list"""
+    if CorpusStore.exists():
+        corpus = CorpusStore(DEFAULT_CORPUS_DIR).corpus
+        step = max(1, len(corpus) // count)
+        return [corpus[i].split("\n")[0].replace("Q:", "").strip() for i in range(0, len(corpus), step)][:count]
+    return (SAMPLE_QUERIES * (count // len(SAMPLE_QUERIES) + 1))[:count]
+
+def time_single(embedder, texts, warmup=5):
+    for text in texts[:warmup]:
+        embedder.encode([text])
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        embedder.encode([text])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+def time_batched(embedder, texts, batch_size):
+    start = time.perf_counter()
+    embedder.encode(texts, batch_size=batch_size)
+    return len(texts) / (time.perf_counter() - start)
+
+def run(backends, texts, onnx_file=None, batch_size=32, min_cosine=0.99):
+    reference = create_embedder("torch", MODEL_NAME)
+    print(
+        f"{'backend':>11} {'load s':>7} {'min cos':>8} {'mean cos':>9} {'p50 ms':>8} {'p99 ms':>8} "
+        f"{'texts/s@' + str(batch_size):>11}"
+    )
+
+    failed = []
+    for backend in backends:
+        start = time.perf_counter()
+        try:
+            embedder = reference if backend == "torch" else create_embedder(
+                backend, MODEL_NAME, onnx_file=onnx_file, fallback=False
+            )
+        except Exception as e:
+            print(f"{backend:>11} unavailable: {e}")
+            continue
+        load_seconds = time.perf_counter() - start
+
+        parity = check_parity(embedder, reference, texts, min_cosine=min_cosine)
+        if not parity["passed"]:
+            failed.append(backend)
+        latencies = time_single(embedder, texts)
+        throughput = time_batched(embedder, texts, batch_size)
+        print(
+            f"{backend:>11} {load_seconds:>7.2f} {parity['min_cosine']:>8.4f} {parity['mean_cosine']:>9.4f} "
+            f"{np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 99):>8.2f} {throughput:>11.1f}"
+        )
+    return failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare query embedder backends")
+    parser.add_argument("--backends", nargs="+", choices=EMBEDDER_BACKENDS, default=list(EMBEDDER_BACKENDS))
+    parser.add_argument("--onnx-file", default=None, help="Prebuilt ONNX graph inside the model repo")
+    parser.add_argument("--texts", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args()
+
+    failed = run(
+        args.backends, sample_texts(args.texts), onnx_file=args.onnx_file,
+        batch_size=args.batch_size, min_cosine=args.min_cosine
+    )
+    if failed:
+        print(f"Parity below {args.min_cosine}: {', '.join(failed)}")
+        sys.exit(1)
@@ -0,0 +1,94 @@
+# benchmark_index.py
+# Recall/latency benchmark of the Retriever index modes on synthetic embeddings.
+#
+# Usage:
+#   python -m app.utils.benchmark_index                                # 10k/100k/1M vectors, all modes
+#   python -m app.utils.benchmark_index --sizes 10000 --types flat hnsw --nprobe 32
+#   python -m app.utils.benchmark_index --sizes 100000 --types flat --dtypes float32 float16 int8
+#
+# Vectors are drawn from a Gaussian mixture and L2-normalized so they cluster like
+# sentence embeddings. Recall@k is measured against the exact flat index; float16/int8
+# and PQ rows include the float32 re-ranking step the Retriever applies.
+import argparse
+import time
+import faiss
+import numpy as np
+from app.services.rag_service.index_factory import INDEX_TYPES, EMBEDDING_DTYPES, build_index, configure_search
+
+def synthetic_embeddings(count, dim, clusters=256, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype("float32")
+    labels = rng.integers(0, clusters, size=count)
+    vectors = centers[labels] + 0.6 * rng.normal(size=(count, dim)).astype("float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+def recall_at_k(found, truth):
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+def time_queries(index, queries, k, data=None, rerank_factor=1):
+    """Per-query latency in ms (batch size 1, like the serving path), with optional float32 re-ranking"""
+    latencies = []
+    results = np.full((len(queries), k), -1, dtype="int64")
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), k * rerank_factor)
+        ids = ids[0][ids[0] >= 0]
+        if rerank_factor > 1:
+            ids = np.sort(ids)
+            ids = ids[np.argsort(-(data[ids] @ query))[:k]]
+        latencies.append((time.perf_counter() - start) * 1000)
+        results[i, :len(ids[:k])] = ids[:k]
+    return np.array(latencies), results
+
+def run(sizes, types, dtypes=("float32",), dim=384, k=5, queries=500, nprobe=16, ef_search=64, rerank_factor=4):
+    print(
+        f"{'vectors':>9} {'index':>6} {'dtype':>8} {'build s':>8} {'size MB':>8} "
+        f"{'recall@' + str(k):>9} {'p50 ms':>8} {'p99 ms':>8}"
+    )
+    for count in sizes:
+        data = synthetic_embeddings(count, dim)
+        query_vectors = synthetic_embeddings(queries, dim, seed=1)
+
+        baseline = build_index(data, "flat")
+        _, truth = baseline.search(query_vectors, k)
+
+        for index_type in types:
+            for dtype in (dtypes if index_type != "ivfpq" else ("float32",)):
+                start = time.perf_counter()
+                index = build_index(data, index_type, dtype=dtype)
+                build_seconds = time.perf_counter() - start
+                configure_search(index, nprobe=nprobe, ef_search=ef_search)
+
+                # Lossy codes are re-ranked in float32, as the Retriever does
+                lossy = dtype != "float32" or index_type == "ivfpq"
+                factor = rerank_factor if lossy else 1
+                size_mb = faiss.serialize_index(index).nbytes / 1e6
+                latencies, found = time_queries(index, query_vectors, k, data=data, rerank_factor=factor)
+                label = dtype if index_type != "ivfpq" else "pq"
+                print(
+                    f"{count:>9} {index_type:>6} {label:>8} {build_seconds:>8.2f} {size_mb:>8.1f} "
+                    f"{recall_at_k(found, truth):>9.3f} {np.percentile(latencies, 50):>8.3f} "
+                    f"{np.percentile(latencies, 99):>8.3f}"
+                )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark Retriever index modes")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--types", nargs="+", choices=INDEX_TYPES, default=list(INDEX_TYPES))
+    parser.add_argument("--dtypes", nargs="+", choices=list(EMBEDDING_DTYPES), default=["float32"])
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--ef-search", type=int, default=64)
+    args = parser.parse_args()
+
+    # Single-threaded search gives stable per-query latencies
+    faiss.omp_set_num_threads(1)
+    run(
+        args.sizes, args.types, dtypes=args.dtypes, dim=args.dim, k=args.k, queries=args.queries,
+        nprobe=args.nprobe, ef_search=args.ef_search, rerank_factor=args.rerank_factor
+    )
@@ -0,0 +1,83 @@
+# benchmark_lexical.py
+# Latency and memory of the BM25 index versus dense search, and of the fused hybrid query.
+#
+# Usage:
+#   python -m app.utils.benchmark_lexical                     # corpus store if built, else synthetic
+#   python -m app.utils.benchmark_lexical --synthetic 100000 --queries 1000
+#
+# The synthetic corpus draws words from a Zipfian vocabulary so posting list lengths look
+# like real text. "hybrid" is Retriever.query with a query text: BM25 on its worker thread,
+# FAISS on the caller, then reciprocal rank fusion.
+import argparse
+import time
+import faiss
+import numpy as np
+from app.services.rag_service.corpus_store import CorpusStore, DEFAULT_CORPUS_DIR
+from app.services.rag_service.lexical import BM25Index
+from app.services.rag_service.retrieval import Retriever
+
+def synthetic_corpus(count, vocab_size=50_000, words=40, dim=384, seed=0):
+    rng = np.random.default_rng(seed)
+    vocab = np.array([f"w{i}" for i in range(vocab_size)])
+    ranks = np.minimum(rng.zipf(1.2, size=(count, words)), vocab_size) - 1
+    corpus = [" ".join(vocab[row]) for row in ranks]
+    embeddings = rng.normal(size=(count, dim)).astype("float32")
+    faiss.normalize_L2(embeddings)
+    return corpus, embeddings
+
+def sample_queries(corpus, count, seed=1):
+    """Short queries made of words taken from random documents (so BM25 has something to find)"""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for doc in rng.integers(0, len(corpus), size=count):
+        words = corpus[int(doc)].split()
+        picks = rng.choice(len(words), size=min(4, len(words)), replace=False)
+        queries.append(" ".join(words[i] for i in sorted(picks)))
+    return queries
+
+def timed(fn, items):
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+def report(label, latencies):
+    print(f"{label:>8} {np.percentile(latencies, 50):>8.3f} {np.percentile(latencies, 99):>8.3f}")
+
+def run(corpus, embeddings, queries, top_k=5):
+    start = time.perf_counter()
+    lexical = BM25Index.build(corpus)
+    print(
+        f"BM25 build: {time.perf_counter() - start:.2f}s, {len(lexical.terms)} terms, "
+        f"{len(lexical.doc_ids)} postings, {lexical.memory_bytes() / 1e6:.1f} MB "
+        f"(dense vectors: {embeddings.nbytes / 1e6:.1f} MB)"
+    )
+
+    rng = np.random.default_rng(2)
+    query_vectors = embeddings[rng.integers(0, len(embeddings), size=len(queries))]
+    dense = Retriever(corpus, embeddings)
+    hybrid = Retriever(corpus, embeddings, lexical=lexical)
+
+    print(f"{'query':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    report("bm25", timed(lambda q: lexical.search(q, top_k=20), queries))
+    report("dense", timed(lambda v: dense.query(v, top_k=top_k), query_vectors))
+    pairs = list(zip(query_vectors, queries))
+    report("hybrid", timed(lambda p: hybrid.query(p[0], top_k=top_k, query_text=p[1]), pairs))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark BM25 and hybrid retrieval")
+    parser.add_argument("--synthetic", type=int, default=0, help="use N synthetic documents instead of the store")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    if not args.synthetic and CorpusStore.exists():
+        store = CorpusStore(DEFAULT_CORPUS_DIR)
+        corpus, embeddings = list(store.corpus), np.asarray(store.embeddings)
+    else:
+        corpus, embeddings = synthetic_corpus(args.synthetic or 100_000)
+
+    faiss.omp_set_num_threads(1)
+    run(corpus, embeddings, sample_queries(corpus, args.queries), top_k=args.top_k)
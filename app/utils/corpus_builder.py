@@ -0,0 +1,353 @@
+# corpus_builder.py
+# Streaming, resumable corpus build pipeline for the RAG knowledge base.
+#
+# Usage:
+#   python -m app.utils.corpus_builder                                   # build from the default dataset
+#   python -m app.utils.corpus_builder --source extra.jsonl --append     # embed only new documents
+#   python -m app.utils.corpus_builder --workers 4 --batch-size 128      # embed across a process pool
+#
+# Records are streamed in chunks, deduplicated, embedded in batches and checkpointed
+# to a work directory after every chunk, so an interrupted build resumes where it stopped.
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import numpy as np
+from app.services.rag_service.corpus_store import CorpusStore, DEFAULT_CORPUS_DIR, DEFAULT_SHARDS_DIR
+from app.services.rag_service.index_factory import INDEX_TYPES, EMBEDDING_DTYPES, build_index
+from app.services.rag_service.retrieval import normalize_embeddings
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_SOURCE = "its-myrto/fitness-question-answers"
+CHECKPOINT_FILE = "checkpoint.json"
+# Same env var as app.config.RAG_INDEX_TYPE (not imported: app.config initializes Firebase)
+DEFAULT_INDEX_TYPE = os.getenv("RAG_INDEX_TYPE", "flat")
+DEFAULT_DTYPE = os.getenv("RAG_EMBEDDING_DTYPE", "float32")
+
+# ----- Record sources -----
+
+def iter_records(source, question_field="Question", answer_field="Answer"):
+    """Stream (question, answer) pairs from a local .jsonl/.csv file or a Hugging Face dataset"""
+    ext = os.path.splitext(source)[1].lower()
+
+    if os.path.exists(source) and ext in (".jsonl", ".json"):
+        with open(source, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    row = json.loads(line)
+                    yield row.get(question_field), row.get(answer_field)
+    elif os.path.exists(source) and ext == ".csv":
+        with open(source, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                yield row.get(question_field), row.get(answer_field)
+    else:
+        from datasets import load_dataset
+
+        if os.path.exists(source):
+            ds = load_dataset(ext.lstrip("."), data_files=source, split="train", streaming=True)
+        else:
+            ds = load_dataset(source, split="train", streaming=True)
+        for row in ds:
+            yield row.get(question_field), row.get(answer_field)
+
+def format_document(question, answer):
+    return f"Q: {question}\nA: {answer}"
+
+# ----- Deduplication -----
+
+def _normalize_text(text):
+    return re.sub(r"\s+", " ", text.lower()).strip()
+
+def content_hash(text):
+    """Exact-duplicate key over normalized text"""
+    return hashlib.sha1(_normalize_text(text).encode("utf-8")).hexdigest()
+
+def simhash(text, shingle_size=3):
+    """64-bit SimHash over word shingles; near-duplicates differ in only a few bits"""
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < shingle_size:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + shingle_size]) for i in range(len(words) - shingle_size + 1)]
+
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles],
+        dtype="<u8"
+    )
+    # Per-bit vote across shingles
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    votes = bits.sum(axis=0) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(votes, bitorder="little").tobytes(), "little")
+
+class Deduplicator:
+    """Exact (content hash) and near-duplicate (SimHash Hamming distance) filter"""
+    BANDS = 4
+
+    def __init__(self, max_distance=3):
+        # With 4 bands of 16 bits, any pair within 3 bits shares at least one identical band
+        self.max_distance = max_distance
+        self.exact = set()
+        self.bands = [dict() for _ in range(self.BANDS)]
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    def _band_keys(self, value):
+        return [(value >> (16 * i)) & 0xFFFF for i in range(self.BANDS)]
+
+    def add(self, digest, fingerprint):
+        self.exact.add(digest)
+        for band, key in zip(self.bands, self._band_keys(fingerprint)):
+            band.setdefault(key, []).append(fingerprint)
+
+    def is_duplicate(self, digest, fingerprint):
+        if digest in self.exact:
+            self.exact_duplicates += 1
+            return True
+        if self.max_distance > 0:
+            for band, key in zip(self.bands, self._band_keys(fingerprint)):
+                for other in band.get(key, ()):
+                    if bin(fingerprint ^ other).count("1") <= self.max_distance:
+                        self.near_duplicates += 1
+                        return True
+        return False
+
+    def check_and_add(self, text):
+        """Return True if text is new (and remember it), False if it duplicates a seen document"""
+        digest, fingerprint = content_hash(text), simhash(text)
+        if self.is_duplicate(digest, fingerprint):
+            return False
+        self.add(digest, fingerprint)
+        return True
+
+# ----- Embedding -----
+
+_worker_model = None
+
+def _init_worker(model_name):
+    global _worker_model
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name)
+
+def _embed_batch(texts):
+    return _worker_model.encode(texts, convert_to_numpy=True, normalize_embeddings=True).astype("float32")
+
+class BatchEmbedder:
+    """Embed texts in fixed-size batches, in process or across a process pool"""
+    def __init__(self, model_name=MODEL_NAME, batch_size=64, workers=0):
+        self.batch_size = batch_size
+        self.pool = None
+        if workers > 0:
+            # spawn: tokenizers/torch threads don't survive fork cleanly
+            self.pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(model_name,)
+            )
+        else:
+            _init_worker(model_name)
+
+    def embed(self, texts):
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if not batches:
+            return np.zeros((0, 0), dtype="float32")
+        if self.pool is not None:
+            results = list(self.pool.map(_embed_batch, batches))
+        else:
+            results = [_embed_batch(batch) for batch in batches]
+        return np.vstack(results)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+# ----- Builder -----
+
+class CorpusBuilder:
+    def __init__(self, output_dir=DEFAULT_CORPUS_DIR, work_dir=None, chunk_size=1024,
+                 embedder=None, near_dup_distance=3, append=False):
+        self.output_dir = output_dir
+        self.work_dir = work_dir or output_dir + ".build"
+        self.chunk_size = chunk_size
+        self.embedder = embedder
+        self.dedup = Deduplicator(max_distance=near_dup_distance)
+        self.append = append
+        self.checkpoint = {"append": append, "sources": {}, "chunks": []}
+
+    # -- checkpoint handling --
+
+    def _checkpoint_path(self):
+        return os.path.join(self.work_dir, CHECKPOINT_FILE)
+
+    def _save_checkpoint(self):
+        tmp = self._checkpoint_path() + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.checkpoint, f, indent=2)
+        os.replace(tmp, self._checkpoint_path())
+
+    def _chunk_paths(self, name):
+        base = os.path.join(self.work_dir, name)
+        return base + ".npy", base + ".texts.json", base + ".hashes.json"
+
+    def prepare(self, restart=False):
+        """Load an existing checkpoint (resume) or start a fresh work directory"""
+        if restart and os.path.exists(self.work_dir):
+            shutil.rmtree(self.work_dir)
+        os.makedirs(self.work_dir, exist_ok=True)
+
+        if os.path.exists(self._checkpoint_path()):
+            with open(self._checkpoint_path(), "r", encoding="utf-8") as f:
+                self.checkpoint = json.load(f)
+            self.append = self.checkpoint.get("append", self.append)
+            print(f"Resuming build: {len(self.checkpoint['chunks'])} chunks already embedded")
+
+        # Existing documents are hashed (not re-embedded) so appends skip what we already have
+        if self.append and CorpusStore.exists(self.output_dir):
+            existing = CorpusStore(self.output_dir)
+            for text in existing.corpus:
+                self.dedup.check_and_add(text)
+            print(f"Appending to existing corpus of {len(existing)} documents")
+
+        for chunk in self.checkpoint["chunks"]:
+            with open(self._chunk_paths(chunk)[2], "r", encoding="utf-8") as f:
+                for digest, fingerprint in json.load(f):
+                    self.dedup.add(digest, fingerprint)
+
+    def _write_chunk(self, texts, embeddings, hashes):
+        name = f"chunk-{len(self.checkpoint['chunks']):05d}"
+        emb_path, texts_path, hashes_path = self._chunk_paths(name)
+        np.save(emb_path, embeddings)
+        with open(texts_path, "w", encoding="utf-8") as f:
+            json.dump(texts, f)
+        with open(hashes_path, "w", encoding="utf-8") as f:
+            json.dump(hashes, f)
+        self.checkpoint["chunks"].append(name)
+
+    def _flush(self, source, pending, consumed):
+        texts = [text for text, _ in pending]
+        if texts:
+            embeddings = self.embedder.embed(texts)
+            self._write_chunk(texts, embeddings, [h for _, h in pending])
+        self.checkpoint["sources"][source] = consumed
+        self._save_checkpoint()
+        print(f"[{source}] {consumed} records processed, {len(self.checkpoint['chunks'])} chunks")
+
+    def ingest(self, source, question_field="Question", answer_field="Answer"):
+        """Stream one source into checkpointed chunks, skipping records consumed by an earlier run"""
+        consumed = self.checkpoint["sources"].get(source, 0)
+        pending = []
+        position = 0
+
+        for position, (question, answer) in enumerate(iter_records(source, question_field, answer_field), start=1):
+            if position <= consumed:
+                continue
+            if not question or not answer:
+                continue
+
+            text = format_document(question, answer)
+            digest, fingerprint = content_hash(text), simhash(text)
+            if self.dedup.is_duplicate(digest, fingerprint):
+                continue
+            self.dedup.add(digest, fingerprint)
+            pending.append((text, (digest, fingerprint)))
+
+            if len(pending) >= self.chunk_size:
+                self._flush(source, pending, position)
+                pending = []
+
+        self._flush(source, pending, max(position, consumed))
+
+    def finalize(self, index_type=DEFAULT_INDEX_TYPE, dtype=DEFAULT_DTYPE, **meta):
+        """Merge existing documents (if appending) and new chunks into the corpus store"""
+        corpus, parts = [], []
+
+        if self.append and CorpusStore.exists(self.output_dir):
+            existing = CorpusStore(self.output_dir)
+            corpus.extend(existing.corpus)
+            parts.append(np.asarray(existing.embeddings))
+            if "sources" in meta:
+                meta["sources"] = existing.meta.get("sources", []) + [
+                    s for s in meta["sources"] if s not in existing.meta.get("sources", [])
+                ]
+
+        for chunk in self.checkpoint["chunks"]:
+            emb_path, texts_path, _ = self._chunk_paths(chunk)
+            with open(texts_path, "r", encoding="utf-8") as f:
+                corpus.extend(json.load(f))
+            parts.append(np.load(emb_path))
+
+        if not corpus:
+            raise ValueError("No documents to write")
+
+        # Train the ANN index here so serving only has to mmap it
+        embeddings = normalize_embeddings(np.vstack(parts))
+        print(f"Building '{index_type}' ({dtype}) index over {len(corpus)} vectors...")
+        index = build_index(embeddings, index_type=index_type, dtype=dtype)
+        result = CorpusStore.write(
+            self.output_dir, corpus, embeddings, index=index, model=MODEL_NAME,
+            index_type=index_type, dtype=dtype, **meta
+        )
+        shutil.rmtree(self.work_dir)
+
+        print(
+            f"Saved corpus store with {result['count']} documents to {self.output_dir} "
+            f"(skipped {self.dedup.exact_duplicates} exact and {self.dedup.near_duplicates} near duplicates)"
+        )
+        return result
+
+def build(sources, output_dir=DEFAULT_CORPUS_DIR, batch_size=64, chunk_size=1024, workers=0,
+          append=False, restart=False, near_dup_distance=3, question_field="Question", answer_field="Answer",
+          index_type=DEFAULT_INDEX_TYPE, dtype=DEFAULT_DTYPE):
+    embedder = BatchEmbedder(MODEL_NAME, batch_size=batch_size, workers=workers)
+    try:
+        builder = CorpusBuilder(
+            output_dir, chunk_size=chunk_size, embedder=embedder,
+            near_dup_distance=near_dup_distance, append=append
+        )
+        builder.prepare(restart=restart)
+        for source in sources:
+            builder.ingest(source, question_field, answer_field)
+        return builder.finalize(index_type=index_type, dtype=dtype, sources=list(sources))
+    finally:
+        embedder.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or extend the RAG corpus store")
+    parser.add_argument("--source", action="append", help="dataset id or local .jsonl/.csv/.parquet file (repeatable)")
+    parser.add_argument("--output", default=DEFAULT_CORPUS_DIR, help="corpus store directory")
+    parser.add_argument("--shard", help="build the named shard under RAG_SHARDS_DIR instead of --output")
+    parser.add_argument("--batch-size", type=int, default=64, help="texts per encode call")
+    parser.add_argument("--chunk-size", type=int, default=1024, help="records per checkpointed chunk")
+    parser.add_argument("--workers", type=int, default=0, help="embedding processes (0 = in process)")
+    parser.add_argument("--append", action="store_true", help="keep existing documents and embed only new ones")
+    parser.add_argument("--restart", action="store_true", help="discard any checkpoint and start over")
+    parser.add_argument("--near-dup-distance", type=int, default=3, help="max SimHash bit distance (0 disables)")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=DEFAULT_INDEX_TYPE, help="ANN index to train")
+    parser.add_argument("--dtype", choices=list(EMBEDDING_DTYPES), default=DEFAULT_DTYPE,
+                        help="precision of the indexed vectors (float32 originals stay on disk for re-ranking)")
+    parser.add_argument("--question-field", default="Question")
+    parser.add_argument("--answer-field", default="Answer")
+    args = parser.parse_args()
+    if args.shard:
+        args.output = os.path.join(os.getenv("RAG_SHARDS_DIR", DEFAULT_SHARDS_DIR), args.shard)
+
+    build(
+        args.source or [DEFAULT_SOURCE],
+        output_dir=args.output,
+        batch_size=args.batch_size,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        append=args.append,
+        restart=args.restart,
+        near_dup_distance=args.near_dup_distance,
+        question_field=args.question_field,
+        answer_field=args.answer_field,
+        index_type=args.index_type,
+        dtype=args.dtype,
+    )
@@ -1,22 +1,43 @@
 # generate_embeddings.py
+# Usage:
+#   python -m app.utils.generate_embeddings                          # embed the dataset into the corpus store
+#   python -m app.utils.generate_embeddings --from-pickle [file.pkl] # import an old fitness_corpus.pkl
+import argparse
 import pickle
-from datasets import load_dataset
-from sentence_transformers import SentenceTransformer
+from app.services.rag_service.corpus_store import CorpusStore, DEFAULT_CORPUS_DIR, LEGACY_CORPUS_FILE
+from app.services.rag_service.index_factory import INDEX_TYPES, EMBEDDING_DTYPES, build_index
+from app.services.rag_service.retrieval import normalize_embeddings
+from app.utils.corpus_builder import build, DEFAULT_SOURCE, MODEL_NAME, DEFAULT_INDEX_TYPE, DEFAULT_DTYPE
 
-# 1. Load dataset
-ds = load_dataset("its-myrto/fitness-question-answers")
-questions = ds["train"]["Question"]
-answers = ds["train"]["Answer"]
+def build_from_dataset(output_dir, index_type=DEFAULT_INDEX_TYPE, dtype=DEFAULT_DTYPE):
+    # Full rebuild through the streaming builder (see corpus_builder.py for append/resume/workers)
+    build([DEFAULT_SOURCE], output_dir=output_dir, restart=True, index_type=index_type, dtype=dtype)
 
-# 2. Build corpus
-corpus = [f"Q: {q}\nA: {a}" for q, a in zip(questions, answers)]
+def import_pickle(pickle_file, output_dir, index_type=DEFAULT_INDEX_TYPE, dtype=DEFAULT_DTYPE):
+    with open(pickle_file, "rb") as f:
+        data = pickle.load(f)
 
-# 3. Embed corpus
-embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-corpus_embeddings = embedder.encode(corpus, convert_to_numpy=True)
+    # Same RAG_INDEX_TYPE / RAG_EMBEDDING_DTYPE index the builder trains, so serving never falls back to flat
+    embeddings = normalize_embeddings(data["embeddings"])
+    print(f"Building '{index_type}' ({dtype}) index over {len(data['corpus'])} vectors...")
+    index = build_index(embeddings, index_type=index_type, dtype=dtype)
+    meta = CorpusStore.write(
+        output_dir, data["corpus"], embeddings, index=index, model=MODEL_NAME,
+        index_type=index_type, dtype=dtype, source=pickle_file
+    )
+    print(f"Imported {meta['count']} documents from {pickle_file} into {output_dir}")
 
-# 4. Save to pickle
-with open("fitness_corpus.pkl", "wb") as f:
-    pickle.dump({"corpus": corpus, "embeddings": corpus_embeddings}, f)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the fitness RAG corpus store")
+    parser.add_argument("--output", default=DEFAULT_CORPUS_DIR, help="corpus store directory")
+    parser.add_argument("--from-pickle", nargs="?", const=LEGACY_CORPUS_FILE, default=None,
+                        help="import an existing fitness_corpus.pkl instead of re-embedding")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=DEFAULT_INDEX_TYPE, help="ANN index to train")
+    parser.add_argument("--dtype", choices=list(EMBEDDING_DTYPES), default=DEFAULT_DTYPE,
+                        help="precision of the indexed vectors (float32 originals stay on disk for re-ranking)")
+    args = parser.parse_args()
 
-print("Saved fitness_corpus.pkl with corpus + embeddings")
+    if args.from_pickle:
+        import_pickle(args.from_pickle, args.output, index_type=args.index_type, dtype=args.dtype)
+    else:
+        build_from_dataset(args.output, index_type=args.index_type, dtype=args.dtype)
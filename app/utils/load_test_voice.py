@@ -0,0 +1,118 @@
+# load_test_voice.py
+# Latency of a cheap endpoint with and without voice turns running against a live server.
+#
+# Usage:
+#   uvicorn app.main:app &                                      # the server under test
+#   python -m app.utils.load_test_voice --audio sample.wav --voice-concurrency 4 --duration 30
+#   python -m app.utils.load_test_voice --probe /api/v1/users/me --header "Authorization: Bearer <token>"
+#
+# Phase 1 probes the cheap endpoint alone for a baseline; phase 2 probes it again while
+# --voice-concurrency clients loop on POST /assistant. With STT/LLM/TTS on their executors
+# the probe p99 should stay near the baseline; if the pipeline blocked the event loop it
+# would rise to roughly one Whisper decode.
+import argparse
+import asyncio
+import io
+import time
+import wave
+import httpx
+import numpy as np
+
+def synthetic_wav(seconds=2.0, rate=16000):
+    """A short 440 Hz tone, for when no recording is given (Whisper still has to decode it)"""
+    t = np.arange(int(seconds * rate)) / rate
+    pcm = (0.3 * np.sin(2 * np.pi * 440 * t) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+def percentiles(latencies):
+    if not latencies:
+        return "no samples"
+    ms = np.asarray(latencies) * 1000
+    return (
+        f"n={len(ms)}  p50={np.percentile(ms, 50):7.1f} ms  p95={np.percentile(ms, 95):7.1f} ms  "
+        f"p99={np.percentile(ms, 99):7.1f} ms  max={ms.max():7.1f} ms"
+    )
+
+async def probe(client, path, headers, until, interval):
+    latencies, errors = [], 0
+    while time.perf_counter() < until:
+        start = time.perf_counter()
+        try:
+            response = await client.get(path, headers=headers)
+            if response.status_code >= 500:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+        except httpx.HTTPError:
+            errors += 1
+        await asyncio.sleep(interval)
+    return latencies, errors
+
+async def voice_client(client, audio, filename, plan_type, user_id, until):
+    latencies, errors = [], 0
+    while time.perf_counter() < until:
+        start = time.perf_counter()
+        try:
+            response = await client.post(
+                "/api/v1/assistant",
+                files={"file": (filename, audio)},
+                data={"planType": plan_type, "user_id": user_id}
+            )
+            if response.status_code != 200:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+        except httpx.HTTPError:
+            errors += 1
+    return latencies, errors
+
+async def run(args):
+    headers = {}
+    for header in args.header or []:
+        name, _, value = header.partition(":")
+        headers[name.strip()] = value.strip()
+    if args.audio:
+        with open(args.audio, "rb") as f:
+            audio, filename = f.read(), args.audio
+    else:
+        audio, filename = synthetic_wav(), "synthetic.wav"
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout) as client:
+        # 1. Baseline: probe alone
+        until = time.perf_counter() + args.duration
+        baseline, baseline_errors = await probe(client, args.probe, headers, until, args.probe_interval)
+
+        # 2. Probe while voice turns run
+        until = time.perf_counter() + args.duration
+        voice_tasks = [
+            voice_client(client, audio, filename, args.plan_type, f"loadtest-{i}", until)
+            for i in range(args.voice_concurrency)
+        ]
+        results = await asyncio.gather(probe(client, args.probe, headers, until, args.probe_interval), *voice_tasks)
+
+    loaded, loaded_errors = results[0]
+    voice = [latency for latencies, _ in results[1:] for latency in latencies]
+    voice_errors = sum(errors for _, errors in results[1:])
+
+    print(f"probe {args.probe} alone:        {percentiles(baseline)}  errors={baseline_errors}")
+    print(f"probe {args.probe} under voice:  {percentiles(loaded)}  errors={loaded_errors}")
+    print(f"voice turns (x{args.voice_concurrency}):          {percentiles(voice)}  errors={voice_errors}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test: cheap endpoint latency while voice turns run")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--probe", default="/", help="cheap endpoint to measure")
+    parser.add_argument("--header", action="append", help="extra probe header, e.g. 'Authorization: Bearer ...'")
+    parser.add_argument("--audio", help="recording to send (default: synthetic 2 s WAV)")
+    parser.add_argument("--plan-type", default="diet")
+    parser.add_argument("--voice-concurrency", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per phase")
+    parser.add_argument("--probe-interval", type=float, default=0.05)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
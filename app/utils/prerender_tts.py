@@ -0,0 +1,24 @@
+# prerender_tts.py
+# Renders every scripted voice prompt (greetings, intake questions, confirmations) into the TTS cache.
+#
+# Usage:
+#   python -m app.utils.prerender_tts            # render prompts missing from VOICE_TTS_CACHE_DIR
+#   python -m app.utils.prerender_tts --list     # print the scripted prompts without rendering
+#
+# The server does the same in the background at startup (VOICE_TTS_PRERENDER); running it at
+# deploy time means the first voice turns after a restart are already served from disk.
+import argparse
+from app.services.voice_service.conversation import scripted_prompts
+from app.services.voice_service.tts import get_tts_service, prerender_scripted_prompts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-render scripted voice prompts into the TTS cache")
+    parser.add_argument("--list", action="store_true", help="only list the prompts")
+    args = parser.parse_args()
+
+    if args.list:
+        for prompt in scripted_prompts():
+            print(prompt)
+    else:
+        prerender_scripted_prompts()
+        print(get_tts_service().cache.stats())
@@ -0,0 +1,15 @@
+# warm_embedding_cache.py
+# Usage: EMBEDDING_CACHE_DB=embeddings.sqlite python -m app.utils.warm_embedding_cache queries.log
+import argparse
+from app.services.rag_service.similarity import encode_queries, get_embedding_cache
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-warm the query embedding cache from a query log")
+    parser.add_argument("log_file", help="one query per line, or JSON lines with a \"query\" field")
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    cache = get_embedding_cache()
+    added = cache.warm_from_log(args.log_file, encode_queries, batch_size=args.batch_size)
+    print(f"Embedded {added} new queries")
+    print(cache.stats())
@@ -0,0 +1,43 @@
+import os
+import pickle
+import numpy as np
+import pytest
+from app.services.rag_service.domain_gate import DomainGate
+from app.services.rag_service.retrieval import normalize_embeddings
+
+CORPUS_FILE = os.path.join(os.path.dirname(__file__), "..", "app", "utils", "corpus", "fitness_corpus.pkl")
+
+# RAGService domain threshold and the RAG_DOMAIN_GATE_MARGIN default
+THRESHOLD = 0.3
+MARGIN = 0.1
+
+@pytest.fixture(scope="module")
+def corpus_embeddings():
+    with open(CORPUS_FILE, "rb") as f:
+        return normalize_embeddings(pickle.load(f)["embeddings"])
+
+@pytest.fixture(scope="module")
+def gate(corpus_embeddings):
+    return DomainGate.build(corpus_embeddings)
+
+def test_rejects_out_of_domain_queries(corpus_embeddings, gate):
+    rng = np.random.default_rng(0)
+    queries = normalize_embeddings(rng.standard_normal((2000, corpus_embeddings.shape[1])).astype("float32"))
+    best = (queries @ corpus_embeddings.T).max(axis=1)
+    out_of_domain = queries[best < THRESHOLD]
+    assert len(out_of_domain) > 1000
+
+    rejected = gate.estimate(out_of_domain) < THRESHOLD - MARGIN
+    assert rejected.mean() > 0.5
+
+def test_never_rejects_corpus_documents(corpus_embeddings, gate):
+    assert (gate.estimate(corpus_embeddings) >= THRESHOLD - MARGIN).all()
+
+def test_near_document_queries_are_searched(corpus_embeddings, gate):
+    rng = np.random.default_rng(1)
+    noise = rng.standard_normal(corpus_embeddings.shape).astype("float32") * 0.05
+    queries = normalize_embeddings(corpus_embeddings + noise)
+    best = (queries @ corpus_embeddings.T).max(axis=1)
+    in_domain = queries[best >= 0.5]
+
+    assert (gate.estimate(in_domain) >= THRESHOLD - MARGIN).all()